@@ -136,6 +136,12 @@ def _initialize_database(app: Flask) -> bool:
             # Initialize sample data if needed
             _initialize_sample_data(manager)
             
+            # Ensure indexes (and the migrations they rely on)
+            _initialize_indexes(manager)
+            
+            # Warm in-process caches
+            _initialize_services(manager)
+            
             # Store manager reference
             app.config['DB_MANAGER'] = manager
             
@@ -200,6 +206,69 @@ def _initialize_sample_data(manager) -> None:
         logger.warning(f"⚠️ Sample data initialization failed: {e}")
 
 
+def _initialize_indexes(manager) -> None:
+    """
+    Create database indexes required by the API.
+    
+    Args:
+        manager: Database connection manager
+    """
+    try:
+        from database import ensure_indexes, missing_required_indexes
+        ensure_indexes(manager.db)
+        missing = missing_required_indexes(manager.db)
+        if missing:
+            logger.error(f"❌ Required indexes missing: {', '.join(missing)}")
+        else:
+            logger.info("✅ Database indexes ready")
+    except Exception as e:
+        logger.warning(f"⚠️ Index initialization failed: {e}")
+
+
+def _initialize_services(manager) -> None:
+    """
+    Build in-process caches that are derived from the database.
+    
+    Args:
+        manager: Database connection manager
+    """
+    try:
+        from services.catalog import get_catalog_version
+        from services.station_index import get_station_index
+        get_station_index().build(manager.db, get_catalog_version()['version'])
+        logger.info("✅ Station index loaded")
+    except Exception as e:
+        logger.warning(f"⚠️ Station index initialization failed: {e}")
+    
+    try:
+        from services.availability import rebuild_availability
+        count = rebuild_availability(manager.db)
+        logger.info(f"✅ Port availability loaded for {count} station(s)")
+    except Exception as e:
+        logger.warning(f"⚠️ Port availability initialization failed: {e}")
+
+
+def start_background_jobs(app: Flask) -> None:
+    """
+    Start the API server's background jobs (the stale session finalizer).
+    
+    Called by the server entrypoints (this module, start_server.py and the
+    gunicorn post_worker_init hook), not by create_app(), so scripts that
+    build an app for a one-off task do not start them.
+    
+    Args:
+        app: Flask application instance
+    """
+    if not app.config.get('DATABASE_INITIALIZED'):
+        return
+    try:
+        from services.stale_sessions import get_session_finalizer
+        get_session_finalizer().start()
+        logger.info("✅ Stale session finalizer started")
+    except Exception as e:
+        logger.warning(f"⚠️ Stale session finalizer failed to start: {e}")
+
+
 def _create_basic_users(db) -> None:
     """
     Create basic test users.
@@ -305,7 +374,7 @@ def _register_routes(app: Flask) -> None:
     def health_check():
         """Health check endpoint with database status"""
         try:
-            from database import get_database_manager
+            from database import get_database_manager, missing_required_indexes
             
             manager = get_database_manager()
             
@@ -322,14 +391,18 @@ def _register_routes(app: Flask) -> None:
                     except:
                         collection_stats[collection] = 0
                 
+                # Indexes that enforce invariants (one active session per user)
+                missing_indexes = missing_required_indexes(db)
+                
                 return jsonify({
-                    'status': 'healthy',
-                    'message': 'EVPulse API is running',
+                    'status': 'degraded' if missing_indexes else 'healthy',
+                    'message': 'Required database indexes are missing' if missing_indexes else 'EVPulse API is running',
                     'database': {
                         'status': 'connected',
                         'healthy': health.get('healthy', False),
                         'latency_ms': health.get('latency_ms'),
                         'state': manager.state,
+                        'missing_indexes': missing_indexes,
                     },
                     'collections': collection_stats,
                     'stats': {
@@ -338,7 +411,7 @@ def _register_routes(app: Flask) -> None:
                         'reconnections': stats.get('reconnections', 0),
                     },
                     'timestamp': datetime.now().isoformat()
-                })
+                }), 503 if missing_indexes else 200
             else:
                 return jsonify({
                     'status': 'degraded',
@@ -437,6 +510,7 @@ USE_MOCK_DATA = False
 
 if __name__ == '__main__':
     app = create_app()
+    start_background_jobs(app)
     
     print("\n" + "=" * 60)
     print("🚀 Starting EVPulse API Server")
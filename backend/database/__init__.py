@@ -42,6 +42,7 @@ from .connection import (
     init_db,
     close_db,
     with_db_retry,
+    run_in_transaction,
     ConnectionState,
 )
 
@@ -71,6 +72,16 @@ from .diagnostics import (
     quick_test,
 )
 
+from .indexes import (
+    ensure_indexes,
+    backfill_station_locations,
+    backfill_station_port_types,
+    backfill_station_availability_summary,
+    backfill_user_stats,
+    ensure_telemetry_collection,
+    missing_required_indexes,
+)
+
 __all__ = [
     # Config
     'MongoDBConfig',
@@ -86,6 +97,7 @@ __all__ = [
     'init_db',
     'close_db',
     'with_db_retry',
+    'run_in_transaction',
     'ConnectionState',
     
     # Exceptions
@@ -111,6 +123,15 @@ __all__ = [
     'DiagnosticResult',
     'run_diagnostics',
     'quick_test',
+    
+    # Indexes
+    'ensure_indexes',
+    'backfill_station_locations',
+    'backfill_station_port_types',
+    'backfill_station_availability_summary',
+    'backfill_user_stats',
+    'ensure_telemetry_collection',
+    'missing_required_indexes',
 ]
 
 __version__ = '2.0.0'
@@ -526,3 +526,39 @@ def close_db() -> None:
     """Close database connection"""
     manager = get_database_manager()
     manager.disconnect()
+
+
+# Server error code for "Transaction numbers are only allowed on a replica set member or mongos"
+_TRANSACTIONS_UNSUPPORTED = 20
+# Set once the server has answered with that error, so later calls skip the attempt
+_transactions_unavailable = False
+
+
+def run_in_transaction(callback: Callable[[Any], T]) -> T:
+    """
+    Run callback(session) inside a multi-document transaction.
+    
+    Uses ClientSession.with_transaction, which retries transient errors and
+    unknown commit results. On a standalone server, where transactions are not
+    available, callback is run once with session=None so writes still happen
+    (each individually atomic).
+    
+    Usage:
+        def work(session):
+            db.a.update_one({...}, {...}, session=session)
+            db.b.insert_one({...}, session=session)
+        run_in_transaction(work)
+    """
+    global _transactions_unavailable
+    if _transactions_unavailable:
+        return callback(None)
+    manager = get_database_manager()
+    try:
+        with manager.client.start_session() as session:
+            return session.with_transaction(callback)
+    except OperationFailure as e:
+        if e.code != _TRANSACTIONS_UNSUPPORTED:
+            raise
+        logger.debug("Transactions unsupported by server, running without one")
+        _transactions_unavailable = True
+        return callback(None)
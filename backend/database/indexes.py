@@ -0,0 +1,254 @@
+"""
+EVPulse Database Indexes
+========================
+Index definitions and the data migrations they depend on.
+Called once at application startup; every operation is idempotent.
+"""
+
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, UpdateOne
+from pymongo.database import Database
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+logger = logging.getLogger('evpulse.database')
+
+# Deleted-station tombstones back delta sync; older sync tokens must do a full reload
+STATION_TOMBSTONE_TTL_SECONDS = 30 * 24 * 3600
+# Raw meter readings are kept for a quarter; sessions keep their final totals
+SESSION_TELEMETRY_TTL_SECONDS = 90 * 24 * 3600
+# Indexes that enforce invariants rather than speed up queries; the API is
+# unhealthy without them
+REQUIRED_INDEXES = {
+    'sessions': ['user_id_1_active_unique'],
+}
+
+
+def missing_required_indexes(db: Database) -> list:
+    """
+    List the REQUIRED_INDEXES that do not exist.
+
+    Args:
+        db: Database instance.
+
+    Returns:
+        "collection.index" names, empty when all are present.
+    """
+    missing = []
+    for collection, names in REQUIRED_INDEXES.items():
+        existing = set(db[collection].index_information())
+        missing.extend(f'{collection}.{name}' for name in names if name not in existing)
+    return missing
+
+
+def ensure_telemetry_collection(db: Database) -> None:
+    """
+    Create the ``session_telemetry`` time-series collection if it is missing.
+
+    Args:
+        db: Database instance.
+    """
+    if 'session_telemetry' in db.list_collection_names():
+        return
+    try:
+        db.create_collection(
+            'session_telemetry',
+            timeseries={'timeField': 'ts', 'metaField': 'meta', 'granularity': 'seconds'},
+            expireAfterSeconds=SESSION_TELEMETRY_TTL_SECONDS
+        )
+    except CollectionInvalid:
+        pass  # Created concurrently by another worker
+
+
+def backfill_station_locations(db: Database) -> int:
+    """
+    Populate the GeoJSON ``location`` field for stations that only have
+    legacy ``{lat, lng}`` coordinates.
+
+    Args:
+        db: Database instance.
+
+    Returns:
+        Number of stations updated.
+    """
+    result = db.stations.update_many(
+        {
+            'location': {'$exists': False},
+            'coordinates.lat': {'$type': 'number'},
+            'coordinates.lng': {'$type': 'number'},
+        },
+        [{'$set': {
+            'location': {
+                'type': 'Point',
+                'coordinates': ['$coordinates.lng', '$coordinates.lat'],
+            },
+            'updated_at': '$$NOW',
+        }}]
+    )
+    return result.modified_count
+
+
+def backfill_station_port_types(db: Database, batch_size: int = 500) -> int:
+    """
+    Populate the normalized ``port_types`` array for stations written before
+    connector types were indexed.
+
+    Args:
+        db: Database instance.
+        batch_size: Number of updates sent per bulk write.
+
+    Returns:
+        Number of stations updated.
+    """
+    from models.station import Station
+
+    updated = 0
+    batch = []
+    now = datetime.utcnow()
+    cursor = db.stations.find({'port_types': {'$exists': False}}, {'ports.type': 1})
+    for station in cursor:
+        batch.append(UpdateOne(
+            {'_id': station['_id']},
+            {'$set': {'port_types': Station.port_type_keys(station.get('ports')), 'updated_at': now}}
+        ))
+        if len(batch) >= batch_size:
+            updated += db.stations.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += db.stations.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+def backfill_station_availability_summary(db: Database) -> int:
+    """
+    Populate the denormalized ``availability_summary`` for stations written
+    before it was maintained on every port status change.
+
+    Args:
+        db: Database instance.
+
+    Returns:
+        Number of stations updated.
+    """
+    from models.station import Station
+
+    result = db.stations.update_many(
+        {'availability_summary': {'$exists': False}},
+        [{'$set': {
+            'availability_summary': Station.summarize_ports_expression('$$NOW'),
+            'updated_at': '$$NOW',
+        }}]
+    )
+    return result.modified_count
+
+
+def backfill_user_stats(db: Database) -> int:
+    """
+    Build ``user_stats`` from completed sessions when the collection is empty,
+    as on the first start after it was introduced. Later completions add to
+    these totals, so they must exist before the first stop is recorded.
+
+    Args:
+        db: Database instance.
+
+    Returns:
+        Number of users with totals written (0 if the collection was populated).
+    """
+    from services.user_stats import rebuild_user_stats
+
+    if db.user_stats.find_one({}, {'_id': 1}) is not None:
+        return 0
+    rebuild_user_stats(db)
+    return db.user_stats.estimated_document_count()
+
+
+def ensure_indexes(db: Database) -> None:
+    """
+    Create all application indexes.
+
+    Args:
+        db: Database instance.
+    """
+    # Backfilled stations get a new updated_at, and the catalog version is
+    # bumped below, so cached ETags and sync tokens pick up the new fields
+    stations_backfilled = 0
+
+    updated = backfill_station_locations(db)
+    stations_backfilled += updated
+    if updated:
+        logger.info(f"Backfilled GeoJSON location on {updated} station(s)")
+
+    updated = backfill_station_port_types(db)
+    stations_backfilled += updated
+    if updated:
+        logger.info(f"Backfilled port_types on {updated} station(s)")
+
+    updated = backfill_station_availability_summary(db)
+    stations_backfilled += updated
+    if updated:
+        logger.info(f"Backfilled availability_summary on {updated} station(s)")
+
+    if stations_backfilled:
+        from services.catalog import catalog_reloaded
+        catalog_reloaded()
+
+    updated = backfill_user_stats(db)
+    if updated:
+        logger.info(f"Backfilled user_stats for {updated} user(s)")
+
+    # Stations - nearest-station search via $geoNear, with connector type and
+    # status bounds in the same index. $geoNear needs a single 2dsphere index,
+    # so drop the location-only one created by earlier versions.
+    if 'location_2dsphere' in db.stations.index_information():
+        db.stations.drop_index('location_2dsphere')
+    db.stations.create_index(
+        [('location', GEOSPHERE), ('port_types', ASCENDING), ('status', ASCENDING)],
+        name='location_2dsphere_port_types_status'
+    )
+    db.stations.create_index([('city', ASCENDING)], name='city_1')
+    # Stations - change detection by the station index and delta sync
+    db.stations.create_index([('updated_at', ASCENDING)], name='updated_at_1')
+    # Station tombstones - deletes for delta sync, expired by a TTL index
+    db.station_tombstones.create_index(
+        [('deleted_at', ASCENDING)],
+        name='deleted_at_ttl',
+        expireAfterSeconds=STATION_TOMBSTONE_TTL_SECONDS
+    )
+
+    # Sessions - newest-first keyset pagination per user and per station
+    db.sessions.create_index(
+        [('user_id', ASCENDING), ('start_time', DESCENDING), ('_id', DESCENDING)],
+        name='user_id_1_start_time_-1__id_-1'
+    )
+    db.sessions.create_index(
+        [('station_id', ASCENDING), ('start_time', DESCENDING), ('_id', DESCENDING)],
+        name='station_id_1_start_time_-1__id_-1'
+    )
+
+    # Sessions - active sessions past their estimated completion, for the stale-session finalizer
+    db.sessions.create_index(
+        [('status', ASCENDING), ('estimated_completion', ASCENDING)],
+        name='status_1_estimated_completion_1'
+    )
+    # Sessions - at most one active session per user, enforced on insert
+    try:
+        db.sessions.create_index(
+            [('user_id', ASCENDING)],
+            name='user_id_1_active_unique',
+            unique=True,
+            partialFilterExpression={'status': 'active'}
+        )
+    except OperationFailure as e:
+        # Existing duplicates must be stopped or cancelled before the index can
+        # build; until then /api/health reports the index missing
+        logger.error(f"Could not create the one-active-session index: {e}")
+
+    # Session telemetry - time-series readings, read newest first per session
+    ensure_telemetry_collection(db)
+    db.session_telemetry.create_index(
+        [('meta.session_id', ASCENDING), ('ts', DESCENDING)],
+        name='meta.session_id_1_ts_-1'
+    )
+
+    logger.info("Database indexes ensured")
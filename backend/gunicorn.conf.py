@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for the EVPulse API.
+
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Live session streams (GET /api/sessions/<id>/stream) stay open for the whole
+charge. The gevent worker class serves each connection from a greenlet, so
+thousands of idle streams cost memory rather than a blocked OS thread each;
+threads, locks and the pymongo client are monkey-patched by the worker.
+"""
+
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+worker_class = 'gevent'
+# Concurrent connections (streams included) per worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+# Streams send a heartbeat every 15 seconds, well inside the worker timeout
+timeout = 60
+
+
+def post_worker_init(worker):
+    """Start background jobs in each worker; a lease lets one of them run at a time"""
+    from app import start_background_jobs
+    start_background_jobs(worker.wsgi)
@@ -6,6 +6,20 @@ class Booking:
     
     collection_name = 'bookings'
     
+    # Response key -> document fields it is built from (for ?fields= projections)
+    RESPONSE_FIELDS = {
+        'id': ('_id',),
+        'userId': ('user_id',),
+        'stationId': ('station_id',),
+        'portId': ('port_id',),
+        'date': ('date',),
+        'timeSlot': ('time_slot',),
+        'chargingType': ('charging_type',),
+        'status': ('status',),
+        'estimatedCost': ('estimated_cost',),
+        'createdAt': ('created_at',),
+    }
+    
     def __init__(self, user_id, station_id, port_id, date, time_slot, charging_type, estimated_cost=0):
         self.user_id = user_id
         self.station_id = station_id
@@ -50,9 +64,9 @@ class Booking:
         booking.updated_at = data.get('updated_at')
         return booking
     
-    def to_response_dict(self):
-        """Convert to API response format"""
-        return {
+    def to_response_dict(self, fields=None):
+        """Convert to API response format, limited to fields when given"""
+        result = {
             'id': self.id if hasattr(self, 'id') else None,
             'userId': self.user_id,
             'stationId': self.station_id,
@@ -64,3 +78,6 @@ class Booking:
             'estimatedCost': self.estimated_cost,
             'createdAt': self.created_at.isoformat() if self.created_at else None
         }
+        if fields is not None:
+            result = {k: v for k, v in result.items() if k in fields}
+        return result
@@ -6,6 +6,29 @@ class Session:
     
     collection_name = 'sessions'
     
+    # Response key -> document fields it is built from (for ?fields= projections)
+    RESPONSE_FIELDS = {
+        'id': ('_id',),
+        'orderId': ('order_id',),
+        'userId': ('user_id',),
+        'stationId': ('station_id',),
+        'portId': ('port_id',),
+        'startTime': ('start_time',),
+        'endTime': ('end_time',),
+        'duration': ('duration',),
+        'energyDelivered': ('energy_delivered',),
+        'cost': ('cost',),
+        'status': ('status',),
+        'chargingType': ('charging_type',),
+        'paymentMethod': ('payment_method',),
+        'progress': ('progress',),
+        'estimatedCompletion': ('estimated_completion',),
+        'batteryStart': ('battery_start',),
+        'batteryEnd': ('battery_end',),
+        'powerKw': ('power_kw',),
+        'lastReadingAt': ('last_reading_at',),
+    }
+    
     def __init__(self, user_id, station_id, port_id, charging_type, payment_method):
         self.order_id = f"ORD-{datetime.utcnow().strftime('%Y')}-{ObjectId()}"
         self.user_id = user_id
@@ -23,6 +46,8 @@ class Session:
         self.estimated_completion = None
         self.battery_start = None
         self.battery_end = None
+        self.power_kw = None
+        self.last_reading_at = None
         self.created_at = datetime.utcnow()
         self.updated_at = datetime.utcnow()
     
@@ -45,6 +70,8 @@ class Session:
             'estimated_completion': self.estimated_completion,
             'battery_start': self.battery_start,
             'battery_end': self.battery_end,
+            'power_kw': self.power_kw,
+            'last_reading_at': self.last_reading_at,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
@@ -70,13 +97,15 @@ class Session:
         session.estimated_completion = data.get('estimated_completion')
         session.battery_start = data.get('battery_start')
         session.battery_end = data.get('battery_end')
+        session.power_kw = data.get('power_kw')
+        session.last_reading_at = data.get('last_reading_at')
         session.created_at = data.get('created_at')
         session.updated_at = data.get('updated_at')
         return session
     
-    def to_response_dict(self):
-        """Convert to API response format"""
-        return {
+    def to_response_dict(self, fields=None):
+        """Convert to API response format, limited to fields when given"""
+        result = {
             'id': self.id if hasattr(self, 'id') else None,
             'orderId': self.order_id,
             'userId': self.user_id,
@@ -93,5 +122,10 @@ class Session:
             'progress': self.progress,
             'estimatedCompletion': self.estimated_completion.isoformat() if self.estimated_completion else None,
             'batteryStart': self.battery_start,
-            'batteryEnd': self.battery_end
+            'batteryEnd': self.battery_end,
+            'powerKw': self.power_kw,
+            'lastReadingAt': self.last_reading_at.isoformat() if self.last_reading_at else None
         }
+        if fields is not None:
+            result = {k: v for k, v in result.items() if k in fields}
+        return result
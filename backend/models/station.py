@@ -1,14 +1,37 @@
 from datetime import datetime
 from bson import ObjectId
+import re
 
 class Station:
     """Charging Station model for MongoDB"""
     
     collection_name = 'stations'
     
+    # Response key -> document fields it is built from (for ?fields= projections)
+    RESPONSE_FIELDS = {
+        'id': ('_id',),
+        'name': ('name',),
+        'address': ('address',),
+        'city': ('city',),
+        'coordinates': ('coordinates',),
+        'operatorId': ('operator_id',),
+        'status': ('status',),
+        'rating': ('rating',),
+        'totalReviews': ('total_reviews',),
+        'amenities': ('amenities',),
+        'operatingHours': ('operating_hours',),
+        'ports': ('ports',),
+        'pricing': ('pricing',),
+        'peakHours': ('peak_hours',),
+        'timezone': ('timezone',),
+        'image': ('image',),
+        'availabilitySummary': ('availability_summary',),
+        'distance': (),
+    }
+    
     def __init__(self, name, address, city, coordinates, operator_id, status='available',
                  amenities=None, operating_hours='24/7', ports=None, pricing=None,
-                 peak_hours=None, image=None):
+                 peak_hours=None, image=None, timezone=None):
         self.name = name
         self.address = address
         self.city = city
@@ -21,14 +44,89 @@ class Station:
         self.operating_hours = operating_hours
         self.ports = ports or []  # [{id, type, power, status, price}]
         self.pricing = pricing or {}  # {normal: {base, peak}, fast: {base, peak}}
-        self.peak_hours = peak_hours  # {start, end}
+        self.peak_hours = peak_hours  # {start, end}, station wall-clock time
+        self.timezone = timezone  # IANA name, e.g. 'Asia/Kolkata'
         self.image = image
         self.created_at = datetime.utcnow()
         self.updated_at = datetime.utcnow()
+        self.availability_summary = Station.summarize_ports(self.ports, self.updated_at)
+    
+    @staticmethod
+    def geo_point(coordinates):
+        """Build a GeoJSON point from {lat, lng} coordinates"""
+        if not coordinates or coordinates.get('lat') is None or coordinates.get('lng') is None:
+            return None
+        return {
+            'type': 'Point',
+            'coordinates': [float(coordinates['lng']), float(coordinates['lat'])]
+        }
+    
+    @staticmethod
+    def normalize_port_type(port_type):
+        """Canonical connector type: lowercase words separated by single spaces"""
+        return ' '.join(re.findall(r'[a-z0-9]+', (port_type or '').lower()))
+    
+    @staticmethod
+    def port_type_keys(ports):
+        """Indexed connector keys for a ports array: each normalized type plus its words"""
+        keys = set()
+        for port in ports or []:
+            normalized = Station.normalize_port_type(port.get('type'))
+            if normalized:
+                keys.add(normalized)
+                keys.update(normalized.split())
+        return sorted(keys)
+    
+    @staticmethod
+    def summarize_ports(ports, updated_at=None):
+        """Port counts by status, overall and per connector type"""
+        summary = {'available': 0, 'busy': 0, 'offline': 0, 'total': 0}
+        by_type = {}
+        for port in ports or []:
+            counts = by_type.setdefault(port.get('type'), {
+                'type': port.get('type'), 'available': 0, 'busy': 0, 'offline': 0, 'total': 0
+            })
+            for bucket in (summary, counts):
+                bucket['total'] += 1
+                if port.get('status') in ('available', 'busy', 'offline'):
+                    bucket[port['status']] += 1
+        summary['by_type'] = sorted(by_type.values(), key=lambda c: str(c['type']))
+        summary['updated_at'] = updated_at or datetime.utcnow()
+        return summary
+    
+    @staticmethod
+    def summarize_ports_expression(updated_at):
+        """Aggregation expression computing availability_summary from $ports inside a pipeline update"""
+        ports = {'$ifNull': ['$ports', []]}
+        
+        def count(source, status):
+            return {'$size': {'$filter': {
+                'input': source, 'as': 'p', 'cond': {'$eq': ['$$p.status', status]}
+            }}}
+        
+        of_type = {'$filter': {'input': ports, 'as': 'p', 'cond': {'$eq': ['$$p.type', '$$t']}}}
+        return {
+            'available': count(ports, 'available'),
+            'busy': count(ports, 'busy'),
+            'offline': count(ports, 'offline'),
+            'total': {'$size': ports},
+            'by_type': {'$map': {
+                'input': {'$setUnion': [{'$map': {'input': ports, 'as': 'p', 'in': '$$p.type'}}]},
+                'as': 't',
+                'in': {
+                    'type': '$$t',
+                    'available': count(of_type, 'available'),
+                    'busy': count(of_type, 'busy'),
+                    'offline': count(of_type, 'offline'),
+                    'total': {'$size': of_type}
+                }
+            }},
+            'updated_at': updated_at
+        }
     
     def to_dict(self):
         """Convert to dictionary for MongoDB insertion"""
-        return {
+        data = {
             'name': self.name,
             'address': self.address,
             'city': self.city,
@@ -40,12 +138,20 @@ class Station:
             'amenities': self.amenities,
             'operating_hours': self.operating_hours,
             'ports': self.ports,
+            'port_types': Station.port_type_keys(self.ports),
+            'availability_summary': Station.summarize_ports(self.ports, self.updated_at),
             'pricing': self.pricing,
             'peak_hours': self.peak_hours,
+            'timezone': self.timezone,
             'image': self.image,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
+        # GeoJSON point backing the 2dsphere index (omitted when coordinates are missing)
+        location = Station.geo_point(self.coordinates)
+        if location:
+            data['location'] = location
+        return data
     
     @staticmethod
     def from_dict(data):
@@ -63,15 +169,32 @@ class Station:
         station.amenities = data.get('amenities', [])
         station.operating_hours = data.get('operating_hours', '24/7')
         station.ports = data.get('ports', [])
+        station.availability_summary = data.get('availability_summary')
+        if station.availability_summary is None and 'ports' in data:
+            station.availability_summary = Station.summarize_ports(station.ports, data.get('updated_at'))
         station.pricing = data.get('pricing', {})
         station.peak_hours = data.get('peak_hours')
+        station.timezone = data.get('timezone')
         station.image = data.get('image')
         station.created_at = data.get('created_at')
         station.updated_at = data.get('updated_at')
         return station
     
-    def to_response_dict(self, distance=None):
-        """Convert to API response format"""
+    def _summary_response(self):
+        summary = self.availability_summary
+        if summary is None:
+            return None
+        return {
+            'available': summary.get('available', 0),
+            'busy': summary.get('busy', 0),
+            'offline': summary.get('offline', 0),
+            'total': summary.get('total', 0),
+            'byType': summary.get('by_type', []),
+            'updatedAt': summary['updated_at'].isoformat() if summary.get('updated_at') else None
+        }
+    
+    def to_response_dict(self, distance=None, fields=None):
+        """Convert to API response format, limited to fields when given"""
         result = {
             'id': self.id if hasattr(self, 'id') else None,
             'name': self.name,
@@ -87,8 +210,12 @@ class Station:
             'ports': self.ports,
             'pricing': self.pricing,
             'peakHours': self.peak_hours,
-            'image': self.image
+            'timezone': self.timezone,
+            'image': self.image,
+            'availabilitySummary': self._summary_response()
         }
         if distance is not None:
             result['distance'] = distance
+        if fields is not None:
+            result = {k: v for k, v in result.items() if k in fields}
         return result
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import mongo
 from models.user import User
+from services.catalog import station_changed
 from bson import ObjectId
 from datetime import datetime, timedelta
 
@@ -26,9 +27,9 @@ def get_admin_stats():
         total_operators = mongo.db.users.count_documents({'role': 'operator'})
         total_stations = mongo.db.stations.count_documents({})
         active_chargers = mongo.db.stations.aggregate([
-            {'$unwind': '$ports'},
-            {'$match': {'ports.status': {'$ne': 'offline'}}},
-            {'$count': 'total'}
+            {'$group': {'_id': None, 'total': {'$sum': {'$subtract': [
+                '$availability_summary.total', '$availability_summary.offline'
+            ]}}}}
         ])
         active_chargers_count = list(active_chargers)
         active_chargers_count = active_chargers_count[0]['total'] if active_chargers_count else 0
@@ -189,6 +190,8 @@ def update_station_status(station_id):
         if result.modified_count == 0:
             return jsonify({'success': False, 'error': 'Station not found'}), 404
         
+        station_changed(station_id)
+        
         return jsonify({'success': True, 'message': 'Station status updated'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -3,6 +3,9 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import mongo
 from models.booking import Booking
 from models.notification import Notification
+from services.fields import InvalidFieldsError, parse_fields, projection_for, wants
+from services.station_names import attach_station_names
+from services.tariff import Tariff, quote, tariff_for
 from bson import ObjectId
 from datetime import datetime
 
@@ -16,6 +19,24 @@ AVAILABLE_TIME_SLOTS = [
     '20:00 - 21:00'
 ]
 
+def _slot_window(date, time_slot):
+    """
+    (start, minutes) of a booking slot such as '18:00 - 19:00' on 'YYYY-MM-DD'.
+    The start is the station's wall-clock time.
+    
+    Raises:
+        ValueError: if the date or slot is malformed or the slot is empty
+    """
+    try:
+        start_text, end_text = [part.strip() for part in time_slot.split('-')]
+        start = datetime.strptime(f'{date} {start_text}', '%Y-%m-%d %H:%M')
+        end = datetime.strptime(f'{date} {end_text}', '%Y-%m-%d %H:%M')
+    except (AttributeError, ValueError):
+        raise ValueError('date must be YYYY-MM-DD and timeSlot "HH:MM - HH:MM"')
+    if end <= start:
+        raise ValueError('timeSlot must end after it starts')
+    return start, (end - start).total_seconds() / 60
+
 @bookings_bp.route('/user/<user_id>', methods=['GET'])
 @jwt_required()
 def get_user_bookings(user_id):
@@ -25,16 +46,20 @@ def get_user_bookings(user_id):
         if mongo.db is None:
             return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
-        bookings_data = list(mongo.db.bookings.find({'user_id': user_id}).sort('date', -1))
+        try:
+            fields = parse_fields(request.args.get('fields'), [*Booking.RESPONSE_FIELDS, 'stationName'])
+        except InvalidFieldsError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        with_station = wants(fields, 'stationName')
+        
+        bookings_data = list(mongo.db.bookings.find(
+            {'user_id': user_id},
+            projection_for(fields, Booking.RESPONSE_FIELDS, required=('station_id',) if with_station else ())
+        ).sort('date', -1))
         
-        bookings = []
-        for data in bookings_data:
-            booking = Booking.from_dict(data)
-            station = mongo.db.stations.find_one({'_id': ObjectId(booking.station_id)})
-            
-            booking_dict = booking.to_response_dict()
-            booking_dict['stationName'] = station['name'] if station else 'Unknown Station'
-            bookings.append(booking_dict)
+        bookings = [Booking.from_dict(data).to_response_dict(fields=fields) for data in bookings_data]
+        if with_station:
+            attach_station_names(bookings, [data.get('station_id') for data in bookings_data])
         
         return jsonify({'success': True, 'data': bookings})
     except Exception as e:
@@ -58,6 +83,11 @@ def create_booking():
             if not data.get(field):
                 return jsonify({'success': False, 'error': f'{field} is required'}), 400
         
+        try:
+            slot_start, slot_minutes = _slot_window(data['date'], data['timeSlot'])
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
         # Check if slot is available
         existing = mongo.db.bookings.find_one({
             'station_id': data['stationId'],
@@ -74,9 +104,10 @@ def create_booking():
         station = mongo.db.stations.find_one({'_id': ObjectId(data['stationId'])})
         charging_type = data.get('chargingType', 'Normal AC')
         
-        # Estimate cost based on slot duration (1 hour)
-        rate = 0.35 if 'fast' in charging_type.lower() else 0.25
-        estimated_cost = round(rate * 30, 2)  # ~30 kWh for 1 hour
+        # Estimate cost for the slot under the station's tariff, peak hours included;
+        # slots are station-local, the tariff works on UTC like stored sessions
+        tariff = tariff_for(station) if station else Tariff()
+        estimated_cost = quote(tariff, charging_type, tariff.to_utc(slot_start), slot_minutes)['estimatedCost']
         
         booking = Booking(
             user_id=user_id,
@@ -182,8 +213,15 @@ def get_station_bookings(station_id):
         if mongo.db is None:
             return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
-        bookings_data = list(mongo.db.bookings.find({'station_id': station_id}).sort('date', -1))
-        bookings = [Booking.from_dict(data).to_response_dict() for data in bookings_data]
+        try:
+            fields = parse_fields(request.args.get('fields'), Booking.RESPONSE_FIELDS)
+        except InvalidFieldsError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        bookings_data = list(mongo.db.bookings.find(
+            {'station_id': station_id}, projection_for(fields, Booking.RESPONSE_FIELDS)
+        ).sort('date', -1))
+        bookings = [Booking.from_dict(data).to_response_dict(fields=fields) for data in bookings_data]
         
         return jsonify({'success': True, 'data': bookings})
     except Exception as e:
@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import mongo
 from models.station import Station
+from services.availability import set_port_status
+from services.catalog import station_changed
+from services.tariff import is_valid_timezone
 from bson import ObjectId
 from datetime import datetime, timedelta
 
@@ -24,12 +27,15 @@ def get_operator_stats():
         if not user or user.get('role') not in ['operator', 'admin']:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
-        # Get operator's stations
-        stations = list(mongo.db.stations.find({'operator_id': user_id}))
+        # Get operator's stations (port counts come from the maintained summary)
+        stations = list(mongo.db.stations.find(
+            {'operator_id': user_id}, {'name': 1, 'availability_summary': 1}
+        ))
         station_ids = [str(s['_id']) for s in stations]
+        summaries = [s.get('availability_summary') or {} for s in stations]
         
         total_stations = len(stations)
-        total_ports = sum(len(s.get('ports', [])) for s in stations)
+        total_ports = sum(summary.get('total', 0) for summary in summaries)
         
         # Get active sessions
         active_sessions = mongo.db.sessions.count_documents({
@@ -58,16 +64,8 @@ def get_operator_stats():
         monthly_energy = sum(s.get('energy_delivered', 0) for s in month_sessions)
         
         # Port utilization
-        total_active_ports = sum(
-            1 for s in stations 
-            for p in s.get('ports', []) 
-            if p.get('status') != 'offline'
-        )
-        busy_ports = sum(
-            1 for s in stations 
-            for p in s.get('ports', []) 
-            if p.get('status') == 'busy'
-        )
+        total_active_ports = sum(summary.get('total', 0) - summary.get('offline', 0) for summary in summaries)
+        busy_ports = sum(summary.get('busy', 0) for summary in summaries)
         port_utilization = (busy_ports / max(total_active_ports, 1)) * 100
         
         # Average session duration
@@ -77,9 +75,12 @@ def get_operator_stats():
         }))
         avg_duration = sum(s.get('duration', 0) for s in completed_sessions) / max(len(completed_sessions), 1)
         
-        # Maintenance alerts
+        # Maintenance alerts - only stations whose summary reports offline ports
+        alert_stations = mongo.db.stations.find(
+            {'operator_id': user_id, 'availability_summary.offline': {'$gt': 0}}, {'ports': 1}
+        )
         alerts = []
-        for station in stations:
+        for station in alert_stations:
             for port in station.get('ports', []):
                 if port.get('status') == 'offline':
                     alerts.append({
@@ -167,15 +168,22 @@ def update_pricing(station_id):
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
         data = request.get_json()
+        update = {
+            'pricing': data.get('pricing', {}),
+            'peak_hours': data.get('peakHours'),
+            'updated_at': datetime.utcnow()
+        }
+        # Peak hours are station wall-clock times; the timezone may be set alongside them
+        if 'timezone' in data:
+            if data['timezone'] and not is_valid_timezone(data['timezone']):
+                return jsonify({'success': False, 'error': 'timezone must be an IANA name such as Asia/Kolkata'}), 400
+            update['timezone'] = data['timezone'] or None
         
         mongo.db.stations.update_one(
             {'_id': ObjectId(station_id)},
-            {'$set': {
-                'pricing': data.get('pricing', {}),
-                'peak_hours': data.get('peakHours'),
-                'updated_at': datetime.utcnow()
-            }}
+            {'$set': update}
         )
+        station_changed(station_id)
         
         return jsonify({'success': True, 'message': 'Pricing updated successfully'})
     except Exception as e:
@@ -197,14 +205,11 @@ def update_port_status(station_id, port_id):
         if new_status not in ['available', 'busy', 'offline']:
             return jsonify({'success': False, 'error': 'Invalid status'}), 400
         
-        result = mongo.db.stations.update_one(
-            {'_id': ObjectId(station_id), 'ports.id': int(port_id)},
-            {'$set': {'ports.$.status': new_status, 'updated_at': datetime.utcnow()}}
-        )
-        
-        if result.modified_count == 0:
+        if set_port_status(station_id, int(port_id), new_status) is None:
             return jsonify({'success': False, 'error': 'Station or port not found'}), 404
         
+        station_changed(station_id)
+        
         return jsonify({'success': True, 'message': 'Port status updated'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -219,7 +224,10 @@ def get_maintenance_alerts():
         if not require_operator():
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
-        stations = list(mongo.db.stations.find({'operator_id': user_id}))
+        stations = mongo.db.stations.find(
+            {'operator_id': user_id, 'availability_summary.offline': {'$gt': 0}},
+            {'name': 1, 'ports': 1}
+        )
         
         alerts = []
         for station in stations:
@@ -299,14 +307,11 @@ def resolve_alert(alert_id):
         station_id, port_id = parts
         
         # Update port status to available
-        result = mongo.db.stations.update_one(
-            {'_id': ObjectId(station_id), 'ports.id': int(port_id)},
-            {'$set': {'ports.$.status': 'available', 'updated_at': datetime.utcnow()}}
-        )
-        
-        if result.modified_count == 0:
+        if set_port_status(station_id, int(port_id), 'available') is None:
             return jsonify({'success': False, 'error': 'Alert not found'}), 404
         
+        station_changed(station_id)
+        
         return jsonify({'success': True, 'message': 'Alert resolved'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
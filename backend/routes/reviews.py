@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import mongo
 from models.review import Review
+from services.catalog import station_changed
+from services.station_names import attach_station_names
 from bson import ObjectId
 from datetime import datetime
 
@@ -65,14 +67,8 @@ def get_user_reviews(user_id):
     try:
         reviews_data = list(mongo.db.reviews.find({'user_id': user_id}).sort('timestamp', -1))
         
-        reviews = []
-        for data in reviews_data:
-            review = Review.from_dict(data)
-            station = mongo.db.stations.find_one({'_id': ObjectId(review.station_id)})
-            
-            review_dict = review.to_response_dict()
-            review_dict['stationName'] = station['name'] if station else 'Unknown Station'
-            reviews.append(review_dict)
+        reviews = [Review.from_dict(data).to_response_dict() for data in reviews_data]
+        attach_station_names(reviews, [data.get('station_id') for data in reviews_data])
         
         return jsonify({'success': True, 'data': reviews})
     except Exception as e:
@@ -132,13 +128,15 @@ def _update_station_rating(station_id):
                 {'_id': ObjectId(station_id)},
                 {'$set': {
                     'rating': round(avg_rating, 1),
-                    'total_reviews': len(reviews)
+                    'total_reviews': len(reviews),
+                    'updated_at': datetime.utcnow()
                 }}
             )
         else:
             mongo.db.stations.update_one(
                 {'_id': ObjectId(station_id)},
-                {'$set': {'rating': 0, 'total_reviews': 0}}
+                {'$set': {'rating': 0, 'total_reviews': 0, 'updated_at': datetime.utcnow()}}
             )
+        station_changed(station_id)
     except Exception as e:
         print(f"Error updating station rating: {e}")
@@ -1,22 +1,91 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import mongo
 from models.session import Session
-from models.notification import Notification
+from services.charging import (
+    ActiveSessionExistsError, PortUnavailableError, complete_session, start_session as start_charging_session
+)
+from services.fields import InvalidFieldsError, parse_fields, projection_for, wants
+from services.pagination import (
+    InvalidCursorError, decode_cursor, encode_cursor, parse_limit, query_fingerprint
+)
+from services.session_events import (
+    STREAM_PROJECTION, STREAM_TOKEN_TTL_SECONDS, get_session_event_hub, issue_stream_token, publish_session,
+    stream_payload, verify_stream_token
+)
+from services.station_names import attach_station_names
+from services.station_timeline import InvalidTimelineError, station_timeline
+from services.telemetry import InvalidTelemetryError, parse_readings, record_readings
+from services.user_stats import get_user_stats as read_user_stats
 from bson import ObjectId
-from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError
+from datetime import datetime, timedelta, timezone
+import json
 
 sessions_bp = Blueprint('sessions', __name__)
 
+# Live progress streams: comment line to keep idle connections open, and how
+# long a quiet stream waits before re-reading writes made by other workers
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_RESYNC_SECONDS = 30
+
+def _find_session_page(query, projection):
+    """
+    Run a session listing newest first, paged with limit/cursor on (start_time, _id).
+    
+    Returns:
+        (session documents, next cursor or None)
+    
+    Raises:
+        InvalidCursorError: if the cursor is malformed or from another listing
+    """
+    cursor = request.args.get('cursor')
+    limit = parse_limit(request.args.get('limit', type=int), cursor)
+    fingerprint = query_fingerprint(query)
+    
+    criteria = dict(query)
+    if cursor:
+        position = decode_cursor(cursor, fingerprint)['p']
+        try:
+            start_time, last_id = position
+            start_time = datetime.fromisoformat(start_time)
+            last_id = ObjectId(last_id)
+        except (TypeError, ValueError) as e:
+            raise InvalidCursorError('Invalid cursor') from e
+        criteria['$or'] = [
+            {'start_time': {'$lt': start_time}},
+            {'start_time': start_time, '_id': {'$lt': last_id}}
+        ]
+    
+    if projection is not None:
+        projection = {**projection, 'start_time': 1}
+    results = mongo.db.sessions.find(criteria, projection).sort([('start_time', -1), ('_id', -1)])
+    if limit:
+        results = results.limit(limit)
+    sessions_data = list(results)
+    
+    next_cursor = None
+    if limit and len(sessions_data) == limit:
+        last = sessions_data[-1]
+        next_cursor = encode_cursor([last['start_time'].isoformat(), str(last['_id'])], fingerprint)
+    return sessions_data, next_cursor
+
 @sessions_bp.route('/user/<user_id>', methods=['GET'])
 @jwt_required()
 def get_user_sessions(user_id):
-    """Get all sessions for a user"""
+    """Get sessions for a user, newest first, paged with limit/cursor"""
     try:
-        sessions_data = list(mongo.db.sessions.find({'user_id': user_id}).sort('start_time', -1))
-        sessions = [Session.from_dict(data).to_response_dict() for data in sessions_data]
+        try:
+            fields = parse_fields(request.args.get('fields'), Session.RESPONSE_FIELDS)
+            sessions_data, next_cursor = _find_session_page(
+                {'user_id': user_id}, projection_for(fields, Session.RESPONSE_FIELDS)
+            )
+        except (InvalidFieldsError, InvalidCursorError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        sessions = [Session.from_dict(data).to_response_dict(fields=fields) for data in sessions_data]
         
-        return jsonify({'success': True, 'data': sessions})
+        return jsonify({'success': True, 'data': sessions, 'nextCursor': next_cursor})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -46,25 +115,6 @@ def start_session():
         user_id = get_jwt_identity()
         data = request.get_json()
         
-        # Check if user already has an active session
-        existing = mongo.db.sessions.find_one({
-            'user_id': user_id,
-            'status': 'active'
-        })
-        
-        if existing:
-            return jsonify({
-                'success': False, 
-                'error': 'You already have an active charging session'
-            }), 400
-        
-        # Update port status to busy
-        mongo.db.stations.update_one(
-            {'_id': ObjectId(data['stationId']), 'ports.id': data['portId']},
-            {'$set': {'ports.$.status': 'busy'}}
-        )
-        
-        # Create new session
         session = Session(
             user_id=user_id,
             station_id=data['stationId'],
@@ -75,8 +125,12 @@ def start_session():
         session.battery_start = data.get('batteryStart', 20)
         session.estimated_completion = datetime.utcnow() + timedelta(minutes=45)
         
-        result = mongo.db.sessions.insert_one(session.to_dict())
-        session.id = str(result.inserted_id)
+        # One active session per user is enforced by a unique index, and the
+        # port is claimed only if it is still available
+        try:
+            start_charging_session(session)
+        except (ActiveSessionExistsError, PortUnavailableError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         return jsonify({'success': True, 'data': session.to_response_dict()}), 201
     except Exception as e:
@@ -87,107 +141,244 @@ def start_session():
 def stop_session(session_id):
     """Stop a charging session"""
     try:
-        session_data = mongo.db.sessions.find_one({'_id': ObjectId(session_id)})
+        # Guarded on status, so a repeated stop cannot bill the session twice;
+        # the client's station and charging type let it skip reading the session
+        data = request.get_json(silent=True) or {}
+        session_data = complete_session(session_id, data.get('stationId'), data.get('chargingType'))
         
         if not session_data:
-            return jsonify({'success': False, 'error': 'Session not found'}), 404
+            if mongo.db.sessions.count_documents({'_id': ObjectId(session_id)}, limit=1) == 0:
+                return jsonify({'success': False, 'error': 'Session not found'}), 404
+            return jsonify({'success': False, 'error': 'Session is not active'}), 400
         
-        # Calculate duration and cost
-        start_time = session_data['start_time']
-        end_time = datetime.utcnow()
-        duration_seconds = (end_time - start_time).total_seconds()
-        duration_minutes = int(duration_seconds / 60)
-        
-        # Get station for pricing
-        station = mongo.db.stations.find_one({'_id': ObjectId(session_data['station_id'])})
-        
-        # Calculate cost (simplified pricing)
-        energy_rate = 0.35 if 'fast' in session_data.get('charging_type', '').lower() else 0.25
-        energy_delivered = round(duration_minutes * 0.8, 1)  # Approximate kWh
-        cost = round(energy_delivered * energy_rate, 2)
-        
-        # Update session
-        mongo.db.sessions.update_one(
-            {'_id': ObjectId(session_id)},
-            {'$set': {
-                'status': 'completed',
-                'end_time': end_time,
-                'duration': duration_minutes,
-                'energy_delivered': energy_delivered,
-                'cost': cost,
-                'progress': 100,
-                'updated_at': datetime.utcnow()
-            }}
-        )
+        session = Session.from_dict(session_data)
         
-        # Update port status back to available
-        mongo.db.stations.update_one(
-            {'_id': ObjectId(session_data['station_id']), 'ports.id': session_data['port_id']},
-            {'$set': {'ports.$.status': 'available'}}
-        )
+        return jsonify({'success': True, 'data': session.to_response_dict()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@sessions_bp.route('/<session_id>/telemetry', methods=['POST'])
+@jwt_required()
+def ingest_telemetry(session_id):
+    """Accept a batch of meter readings for an active session"""
+    try:
+        try:
+            readings = parse_readings(request.get_json(silent=True))
+        except InvalidTelemetryError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        # Create transaction record
-        from models.transaction import Transaction
-        transaction = Transaction(
-            user_id=session_data['user_id'],
-            amount=cost,
-            transaction_type='charging',
-            payment_method=session_data.get('payment_method', 'Wallet'),
-            description=f"Charging session at station",
-            session_id=session_id
-        )
-        mongo.db.transactions.insert_one(transaction.to_dict())
-        
-        # Create notification
-        notification = Notification(
-            user_id=session_data['user_id'],
-            notification_type='charging_complete',
-            title='Charging Complete',
-            message=f'Your vehicle has finished charging. Total: ${cost}',
-            action_url='/user/history'
+        session_data = mongo.db.sessions.find_one(
+            {'_id': ObjectId(session_id)}, {'user_id': 1, 'station_id': 1, 'status': 1}
         )
-        mongo.db.notifications.insert_one(notification.to_dict())
         
-        # Get updated session
-        updated_session = mongo.db.sessions.find_one({'_id': ObjectId(session_id)})
-        session = Session.from_dict(updated_session)
+        if not session_data:
+            return jsonify({'success': False, 'error': 'Session not found'}), 404
         
-        return jsonify({'success': True, 'data': session.to_response_dict()})
+        user_id = get_jwt_identity()
+        if session_data['user_id'] != user_id:
+            user_data = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'role': 1})
+            if not user_data or user_data.get('role') not in ['operator', 'admin']:
+                return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+        
+        if session_data.get('status') != 'active':
+            return jsonify({'success': False, 'error': 'Session is not active'}), 400
+        
+        # Buffered; written to the time-series collection by the telemetry flusher
+        record_readings(session_id, session_data['station_id'], readings)
+        
+        return jsonify({'success': True, 'data': {'accepted': len(readings)}}), 202
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def _can_watch(session_data, user_id):
+    """Whether a user may follow a session: its owner, an operator or an admin"""
+    if session_data['user_id'] == user_id:
+        return True
+    user_data = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'role': 1})
+    return bool(user_data) and user_data.get('role') in ['operator', 'admin']
+
+@sessions_bp.route('/<session_id>/stream-token', methods=['POST'])
+@jwt_required()
+def create_stream_token(session_id):
+    """Issue a short-lived token for opening a session's progress stream"""
+    try:
+        session_data = mongo.db.sessions.find_one({'_id': ObjectId(session_id)}, {'user_id': 1})
+        
+        if not session_data:
+            return jsonify({'success': False, 'error': 'Session not found'}), 404
+        
+        user_id = get_jwt_identity()
+        if not _can_watch(session_data, user_id):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+        
+        token = issue_stream_token(current_app.config['SECRET_KEY'], session_id, user_id)
+        return jsonify({'success': True, 'data': {'token': token, 'expiresIn': STREAM_TOKEN_TTL_SECONDS}})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@sessions_bp.route('/<session_id>/stream', methods=['GET'])
+def stream_session(session_id):
+    """
+    Server-sent events with a session's progress, energy and ETA until it ends.
+    
+    Authenticated with ?token= from POST /<session_id>/stream-token. Each
+    open stream holds a worker connection; run the server with the gevent
+    worker class (gunicorn.conf.py) so idle streams cost a greenlet, not a thread.
+    """
+    try:
+        user_id = verify_stream_token(current_app.config['SECRET_KEY'], request.args.get('token'), session_id)
+        if user_id is None:
+            return jsonify({'success': False, 'error': 'Invalid or expired stream token'}), 401
+        
+        session_data = mongo.db.sessions.find_one({'_id': ObjectId(session_id)}, {**STREAM_PROJECTION, 'user_id': 1})
+        
+        if not session_data:
+            return jsonify({'success': False, 'error': 'Session not found'}), 404
+        
+        hub = get_session_event_hub()
+        payload = stream_payload(session_data)
+        
+        def resync():
+            """Re-read the session so writes by other workers reach this stream"""
+            try:
+                current = mongo.db.sessions.find_one({'_id': ObjectId(session_id)}, STREAM_PROJECTION)
+            except PyMongoError as e:
+                # Keep the stream open; the next quiet period tries again
+                return f'event: error\ndata: {json.dumps({"error": str(e)})}\n\n'
+            if current:
+                publish_session(current)
+            return None
+        
+        def events():
+            channel = hub.subscribe(session_id, payload)
+            try:
+                # A channel opened by an earlier stream may predate this read
+                publish_session(session_data)
+                seq, latest = channel.seq, channel.payload
+                quiet = 0
+                while True:
+                    yield f'event: progress\ndata: {json.dumps(latest)}\n\n'
+                    if latest.get('status') != 'active':
+                        yield 'event: end\ndata: {}\n\n'
+                        return
+                    update = hub.wait(channel, seq, STREAM_HEARTBEAT_SECONDS)
+                    while update is None:
+                        yield ': heartbeat\n\n'
+                        quiet += STREAM_HEARTBEAT_SECONDS
+                        if quiet >= STREAM_RESYNC_SECONDS:
+                            quiet = 0
+                            error = resync()
+                            if error:
+                                yield error
+                        update = hub.wait(channel, seq, STREAM_HEARTBEAT_SECONDS)
+                    seq, latest = update
+                    quiet = 0
+            finally:
+                hub.unsubscribe(session_id, channel)
+        
+        return Response(events(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @sessions_bp.route('/station/<station_id>', methods=['GET'])
 @jwt_required()
 def get_station_sessions(station_id):
-    """Get all sessions for a station"""
+    """Get sessions for a station, newest first, paged with limit/cursor"""
     try:
-        sessions_data = list(mongo.db.sessions.find({'station_id': station_id}).sort('start_time', -1))
-        sessions = [Session.from_dict(data).to_response_dict() for data in sessions_data]
+        try:
+            fields = parse_fields(request.args.get('fields'), Session.RESPONSE_FIELDS)
+            sessions_data, next_cursor = _find_session_page(
+                {'station_id': station_id}, projection_for(fields, Session.RESPONSE_FIELDS)
+            )
+        except (InvalidFieldsError, InvalidCursorError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        return jsonify({'success': True, 'data': sessions})
+        sessions = [Session.from_dict(data).to_response_dict(fields=fields) for data in sessions_data]
+        
+        return jsonify({'success': True, 'data': sessions, 'nextCursor': next_cursor})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def _parse_time_arg(name):
+    """Optional ISO 8601 query parameter as a naive UTC datetime"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise InvalidTimelineError(f'{name} must be an ISO 8601 time')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+@sessions_bp.route('/station/<station_id>/timeline', methods=['GET'])
+@jwt_required()
+def get_station_timeline(station_id):
+    """Get a station's sessions, energy, revenue and occupancy per 15min/hour/day bucket"""
+    try:
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
+        
+        if not ObjectId.is_valid(station_id):
+            return jsonify({'success': False, 'error': 'Station not found'}), 404
+        station = mongo.db.stations.find_one(
+            {'_id': ObjectId(station_id)}, {'operator_id': 1, 'availability_summary': 1}
+        )
+        if not station:
+            return jsonify({'success': False, 'error': 'Station not found'}), 404
+        
+        user_id = get_jwt_identity()
+        if station.get('operator_id') != user_id:
+            user = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'role': 1})
+            if not user or user.get('role') != 'admin':
+                return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+        
+        bucket = request.args.get('bucket', 'hour')
+        ports = (station.get('availability_summary') or {}).get('total', 0)
+        try:
+            start, end, buckets = station_timeline(
+                station_id, bucket, _parse_time_arg('from'), _parse_time_arg('to'), ports=ports
+            )
+        except InvalidTimelineError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'bucket': bucket,
+                'from': start.isoformat(),
+                'to': end.isoformat(),
+                'ports': ports,
+                'buckets': buckets
+            }
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @sessions_bp.route('/history/<user_id>', methods=['GET'])
 @jwt_required()
 def get_charging_history(user_id):
-    """Get charging history for a user"""
+    """Get charging history for a user, newest first, paged with limit/cursor"""
     try:
-        sessions_data = list(mongo.db.sessions.find({
-            'user_id': user_id,
-            'status': 'completed'
-        }).sort('start_time', -1))
-        
-        history = []
-        for data in sessions_data:
-            session = Session.from_dict(data)
-            station = mongo.db.stations.find_one({'_id': ObjectId(session.station_id)})
-            
-            history_item = session.to_response_dict()
-            history_item['stationName'] = station['name'] if station else 'Unknown Station'
-            history.append(history_item)
-        
-        return jsonify({'success': True, 'data': history})
+        try:
+            fields = parse_fields(request.args.get('fields'), [*Session.RESPONSE_FIELDS, 'stationName'])
+            with_station = wants(fields, 'stationName')
+            sessions_data, next_cursor = _find_session_page(
+                {'user_id': user_id, 'status': 'completed'},
+                projection_for(fields, Session.RESPONSE_FIELDS, required=('station_id',) if with_station else ())
+            )
+        except (InvalidFieldsError, InvalidCursorError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        history = [Session.from_dict(data).to_response_dict(fields=fields) for data in sessions_data]
+        if with_station:
+            attach_station_names(history, [data.get('station_id') for data in sessions_data])
+        
+        return jsonify({'success': True, 'data': history, 'nextCursor': next_cursor})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -196,24 +387,7 @@ def get_charging_history(user_id):
 def get_user_stats(user_id):
     """Get charging statistics for a user"""
     try:
-        sessions = list(mongo.db.sessions.find({
-            'user_id': user_id,
-            'status': 'completed'
-        }))
-        
-        total_energy = sum(s.get('energy_delivered', 0) for s in sessions)
-        total_cost = sum(s.get('cost', 0) for s in sessions)
-        total_sessions = len(sessions)
-        avg_duration = sum(s.get('duration', 0) for s in sessions) / total_sessions if total_sessions > 0 else 0
-        
-        stats = {
-            'totalEnergy': round(total_energy, 1),
-            'totalCost': round(total_cost, 2),
-            'totalSessions': total_sessions,
-            'avgSessionDuration': round(avg_duration),
-            'co2Saved': round(total_energy * 0.4, 1)  # kg CO2 saved estimate
-        }
-        
-        return jsonify({'success': True, 'data': stats})
+        # Single primary-key read of the totals maintained by stop_session
+        return jsonify({'success': True, 'data': read_user_stats(user_id)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -3,28 +3,172 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import mongo
 from models.station import Station
 from bson import ObjectId
-from datetime import datetime
-import math
+from services.availability import (
+    get_availability, set_port_status, sync_station_ports, sync_stations, MAX_AVAILABILITY_IDS
+)
+from services.catalog import (
+    station_changed, station_deleted, catalog_reloaded, catalog_changes, get_catalog_version,
+    decode_sync_token, encode_sync_token, SyncTokenExpiredError
+)
+from services.clusters import MIN_ZOOM, MAX_ZOOM
+from services.fields import InvalidFieldsError, parse_fields, projection_for
+from services.geo import decode_polyline
+from services.http_cache import not_modified, cacheable
+from services.pagination import (
+    InvalidCursorError, decode_cursor, encode_cursor, parse_limit, query_fingerprint
+)
+from services.station_import import ImportReport, import_stations, read_csv, read_ndjson
+from services.station_index import get_station_index, MAX_SEARCH_RADIUS_KM
+from services.tariff import is_valid_timezone, load_tariffs, quote
+from datetime import datetime, timezone
+import heapq
 
 stations_bp = Blueprint('stations', __name__)
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two coordinates in km using Haversine formula"""
-    R = 6371  # Earth's radius in km
+# Route corridor search limits
+DEFAULT_CORRIDOR_WIDTH_KM = 5
+MAX_CORRIDOR_WIDTH_KM = 50
+MAX_ROUTE_POINTS = 50000
+
+# Batch lookup limit
+MAX_BATCH_IDS = 500
+
+# Longest charge a quote can cover
+MAX_QUOTE_MINUTES = 24 * 60
+
+# Autocomplete result limits
+DEFAULT_SUGGEST_LIMIT = 10
+MAX_SUGGEST_LIMIT = 50
+
+def _station_predicate(status, city, charging_type):
+    """Build an in-memory filter matching the listing query parameters"""
+    wanted_type = Station.normalize_port_type(charging_type) if charging_type and charging_type != 'all' else None
+    
+    def matches(station):
+        if status and status != 'all' and station.get('status', 'available') != status:
+            return False
+        if city and station.get('city') != city:
+            return False
+        if wanted_type:
+            port_types = station.get('port_types')
+            if port_types is None:
+                port_types = Station.port_type_keys(station.get('ports'))
+            if wanted_type not in port_types:
+                return False
+        return True
+    
+    return matches
+
+def _rating_key(station):
+    """Sort key for rating order: highest rating first, station id breaks ties"""
+    return (-(station.get('rating') or 0), str(station['_id']))
+
+def _search_station_index(index, lat, lng, max_distance, sort_by, limit, predicate, after):
+    """
+    Answer a listing query from the in-process station index.
+    
+    Returns:
+        [(distance_km, station, position)] where position is the keyset cursor value
+    """
+    if sort_by == 'rating':
+        matches = index.within_radius(lat, lng, max_distance or MAX_SEARCH_RADIUS_KM, predicate)
+        if after is not None:
+            after_key = (-after[0], after[1])
+            matches = [m for m in matches if _rating_key(m[1]) > after_key]
+        if limit:
+            # Heap-based top-k instead of sorting every match
+            matches = heapq.nsmallest(limit, matches, key=lambda m: _rating_key(m[1]))
+        else:
+            matches.sort(key=lambda m: _rating_key(m[1]))
+        return [(d, st, [st.get('rating') or 0, str(st['_id'])]) for d, st in matches]
+    
+    if limit:
+        matches = index.nearest(lat, lng, limit, predicate, max_distance_km=max_distance, after=after)
+    else:
+        matches = index.within_radius(lat, lng, max_distance or MAX_SEARCH_RADIUS_KM, predicate)
+    return [(d, st, [d, str(st['_id'])]) for d, st in matches]
+
+def _search_geo_near(lat, lng, max_distance, sort_by, limit, status, city, charging_type, after,
+                     projection=None):
+    """
+    Answer a listing query with a $geoNear aggregation.
     
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+    Returns:
+        [(distance_km, station, position)] where position is the keyset cursor value
+    """
+    query = {}
+    if status and status != 'all':
+        query['status'] = status
+    if city:
+        query['city'] = city
+    if charging_type and charging_type != 'all':
+        query['port_types'] = Station.normalize_port_type(charging_type)
     
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    # Let MongoDB filter and order by distance using the compound 2dsphere index
+    geo_near = {
+        'near': {'type': 'Point', 'coordinates': [lng, lat]},
+        'key': 'location',
+        'distanceField': 'distance_m',
+        'spherical': True,
+        'query': query
+    }
+    if max_distance:
+        geo_near['maxDistance'] = max_distance * 1000  # km -> meters
+    
+    pipeline = [{'$geoNear': geo_near}]
+    if sort_by == 'rating':
+        if after is not None:
+            pipeline.append({'$match': {'$or': [
+                {'rating': {'$lt': after[0]}},
+                {'rating': after[0], '_id': {'$gt': ObjectId(after[1])}}
+            ]}})
+        pipeline.append({'$sort': {'rating': -1, '_id': 1}})
+    elif limit:
+        if after is not None:
+            geo_near['minDistance'] = after[0]
+            pipeline.append({'$match': {'$or': [
+                {'distance_m': {'$gt': after[0]}},
+                {'distance_m': after[0], '_id': {'$gt': ObjectId(after[1])}}
+            ]}})
+        # $sort followed by $limit is executed as a top-k sort
+        pipeline.append({'$sort': {'distance_m': 1, '_id': 1}})
+    if limit:
+        pipeline.append({'$limit': limit})
+    if projection:
+        # Trim documents after the top-k so only requested fields leave the server
+        pipeline.append({'$project': {**projection, 'distance_m': 1, 'rating': 1}})
+    
+    results = []
+    for data in mongo.db.stations.aggregate(pipeline):
+        if sort_by == 'rating':
+            position = [data.get('rating') or 0, str(data['_id'])]
+        else:
+            position = [data['distance_m'], str(data['_id'])]
+        results.append((data['distance_m'] / 1000, data, position))
+    return results
+
+def _station_changes(token, fields):
+    """Delta sync response: stations written and ids deleted since the token"""
+    try:
+        since, since_version = decode_sync_token(token)
+    except SyncTokenExpiredError as e:
+        return jsonify({'success': False, 'error': str(e)}), 410
+    except InvalidCursorError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    return round(R * c, 1)
+    stations, deleted, sync_token = catalog_changes(
+        since, since_version, projection_for(fields, Station.RESPONSE_FIELDS, required=('updated_at',))
+    )
+    return jsonify({
+        'success': True,
+        'data': [Station.from_dict(data).to_response_dict(fields=fields) for data in stations],
+        'deleted': deleted,
+        'syncToken': sync_token
+    })
 
 @stations_bp.route('', methods=['GET'])
 def get_all_stations():
-    """Get all stations with optional filters"""
+    """Get all stations with optional filters, paged with limit/cursor; since=<token> returns only changes"""
     try:
         # Check if database is available
         if mongo.db is None:
@@ -38,50 +182,294 @@ def get_all_stations():
         user_lat = request.args.get('lat', 37.7749, type=float)
         user_lng = request.args.get('lng', -122.4194, type=float)
         city = request.args.get('city')
+        cursor = request.args.get('cursor')
+        limit = parse_limit(request.args.get('limit', type=int), cursor)
+        if sort_by != 'rating':
+            sort_by = 'distance'
+        try:
+            fields = parse_fields(request.args.get('fields'), Station.RESPONSE_FIELDS)
+        except InvalidFieldsError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        if request.args.get('since'):
+            return _station_changes(request.args['since'], fields)
+        
+        # Unchanged catalog: answer 304 before querying or serializing anything
+        issued_at = datetime.utcnow()
+        catalog = get_catalog_version()
+        etag = f"stations-{catalog['version']}"
+        if fields is not None:
+            etag += f"-{query_fingerprint(sorted(fields))}"
+        cached = not_modified(etag, catalog['updated_at'])
+        if cached is not None:
+            return cached
+        
+        index = get_station_index()
+        source = 'index' if index.is_ready else 'db'
+        fingerprint = query_fingerprint([status, city, charging_type, max_distance, sort_by, user_lat, user_lng])
+        
+        after = None
+        if cursor:
+            try:
+                payload = decode_cursor(cursor, fingerprint)
+                after = tuple(payload['p'])
+                # Positions are only comparable within the backend that issued them
+                if payload.get('src') == 'db':
+                    source = 'db'
+                elif not index.is_ready:
+                    raise InvalidCursorError('Cursor has expired')
+            except (InvalidCursorError, TypeError, ValueError) as e:
+                return jsonify({'success': False, 'error': str(e) or 'Invalid cursor'}), 400
+        
+        # Serve from the in-process index when it is loaded, otherwise fall back to MongoDB
+        if source == 'index':
+            index.ensure_fresh(mongo.db, catalog['version'])
+            predicate = _station_predicate(status, city, charging_type)
+            matches = _search_station_index(index, user_lat, user_lng, max_distance, sort_by,
+                                            limit, predicate, after)
+        else:
+            matches = _search_geo_near(user_lat, user_lng, max_distance, sort_by, limit,
+                                       status, city, charging_type, after,
+                                       projection_for(fields, Station.RESPONSE_FIELDS))
+        
+        stations = [
+            Station.from_dict(data).to_response_dict(distance=round(distance, 1), fields=fields)
+            for distance, data, _ in matches
+        ]
+        
+        next_cursor = None
+        if limit and len(matches) == limit:
+            next_cursor = encode_cursor(matches[-1][2], fingerprint, src=source)
+        
+        response = jsonify({
+            'success': True,
+            'data': stations,
+            'nextCursor': next_cursor,
+            'syncToken': encode_sync_token(issued_at, catalog['version'])
+        })
+        return cacheable(response, etag, catalog['updated_at'])
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@stations_bp.route('/clusters', methods=['GET'])
+def get_station_clusters():
+    """Get map cluster markers for a viewport (bbox=minLng,minLat,maxLng,maxLat&zoom=)"""
+    try:
+        # Check if database is available
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
+        
+        try:
+            min_lng, min_lat, max_lng, max_lat = [float(v) for v in request.args.get('bbox', '').split(',')]
+        except ValueError:
+            return jsonify({'success': False, 'error': 'bbox must be minLng,minLat,maxLng,maxLat'}), 400
+        
+        zoom = request.args.get('zoom', type=int)
+        if zoom is None:
+            return jsonify({'success': False, 'error': 'zoom is required'}), 400
+        zoom = max(MIN_ZOOM, min(zoom, MAX_ZOOM))
+        
+        if not (-90 <= min_lat <= max_lat <= 90) or not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            return jsonify({'success': False, 'error': 'Invalid bbox'}), 400
+        
+        catalog = get_catalog_version()
+        etag = f"clusters-{catalog['version']}"
+        cached = not_modified(etag, catalog['updated_at'])
+        if cached is not None:
+            return cached
+        
+        index = get_station_index()
+        index.ensure_fresh(mongo.db, catalog['version'])
+        clusters = index.clusters(min_lat, min_lng, max_lat, max_lng, zoom)
+        
+        response = jsonify({'success': True, 'data': clusters, 'zoom': zoom})
+        return cacheable(response, etag, catalog['updated_at'])
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@stations_bp.route('/along-route', methods=['POST'])
+def get_stations_along_route():
+    """Get stations within a corridor around an encoded polyline, in route order"""
+    try:
+        # Check if database is available
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
-        # Build query
-        query = {}
-        if status and status != 'all':
-            query['status'] = status
-        if city:
-            query['city'] = city
+        data = request.get_json() or {}
+        encoded = data.get('polyline')
+        if not encoded or not isinstance(encoded, str):
+            return jsonify({'success': False, 'error': 'polyline is required'}), 400
+        
+        try:
+            width = float(data.get('width', DEFAULT_CORRIDOR_WIDTH_KM))
+            route = decode_polyline(encoded, int(data.get('precision', 5)))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f'Invalid route: {e}'}), 400
+        
+        if not route:
+            return jsonify({'success': False, 'error': 'polyline has no points'}), 400
+        if len(route) > MAX_ROUTE_POINTS:
+            return jsonify({'success': False, 'error': f'polyline exceeds {MAX_ROUTE_POINTS} points'}), 400
+        if not 0 < width <= MAX_CORRIDOR_WIDTH_KM:
+            return jsonify({'success': False, 'error': f'width must be between 0 and {MAX_CORRIDOR_WIDTH_KM} km'}), 400
+        
+        index = get_station_index()
+        index.ensure_fresh(mongo.db, get_catalog_version()['version'])
+        predicate = _station_predicate(data.get('status'), data.get('city'), data.get('chargingType'))
+        matches, route_length = index.along_route(route, width, predicate)
         
-        # Fetch from MongoDB database
-        stations_data = list(mongo.db.stations.find(query))
         stations = []
+        for offset, distance, station_data in matches:
+            station = Station.from_dict(station_data).to_response_dict(distance=round(distance, 1))
+            station['routeOffset'] = round(offset, 1)
+            stations.append(station)
+        
+        return jsonify({'success': True, 'data': stations, 'routeLength': round(route_length, 1)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@stations_bp.route('/suggest', methods=['GET'])
+def suggest_stations():
+    """Autocomplete stations by name, city or address prefix (q=), nearest first among equals"""
+    try:
+        # Check if database is available
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
+        
+        query = request.args.get('q', '')
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        limit = request.args.get('limit', DEFAULT_SUGGEST_LIMIT, type=int)
+        limit = max(1, min(limit, MAX_SUGGEST_LIMIT))
+        predicate = _station_predicate(request.args.get('status'), request.args.get('city'), None)
+        
+        index = get_station_index()
+        index.ensure_fresh(mongo.db, get_catalog_version()['version'])
+        matches = index.suggest(query, lat, lng, limit, predicate)
+        
+        suggestions = []
+        for score, distance, station in matches:
+            suggestion = {
+                'id': str(station['_id']),
+                'name': station.get('name'),
+                'city': station.get('city'),
+                'address': station.get('address'),
+                'rating': station.get('rating', 0),
+                'score': score
+            }
+            if distance is not None:
+                suggestion['distance'] = round(distance, 1)
+            suggestions.append(suggestion)
+        
+        return jsonify({'success': True, 'data': suggestions})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@stations_bp.route('/availability', methods=['GET'])
+def get_stations_availability():
+    """Get live port availability for several stations (ids=id1,id2,...)"""
+    try:
+        # Check if database is available
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
-        for data in stations_data:
-            station = Station.from_dict(data)
-            
-            # Calculate distance
-            distance = calculate_distance(
-                user_lat, user_lng,
-                station.coordinates.get('lat', 0),
-                station.coordinates.get('lng', 0)
+        station_ids = list(dict.fromkeys(i for i in request.args.get('ids', '').split(',') if i))
+        if not station_ids:
+            return jsonify({'success': False, 'error': 'ids is required'}), 400
+        if len(station_ids) > MAX_AVAILABILITY_IDS:
+            return jsonify({'success': False, 'error': f'At most {MAX_AVAILABILITY_IDS} ids per request'}), 400
+        
+        response = jsonify({'success': True, 'data': get_availability(station_ids)})
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@stations_bp.route('/batch', methods=['POST'])
+def get_stations_batch():
+    """Get many stations by ID in one request, keyed by ID"""
+    try:
+        # Check if database is available
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
+        
+        data = request.get_json() or {}
+        station_ids = data.get('ids')
+        if not isinstance(station_ids, list) or not station_ids:
+            return jsonify({'success': False, 'error': 'ids must be a non-empty list'}), 400
+        station_ids = list(dict.fromkeys(str(i) for i in station_ids))
+        if len(station_ids) > MAX_BATCH_IDS:
+            return jsonify({'success': False, 'error': f'At most {MAX_BATCH_IDS} ids per request'}), 400
+        
+        try:
+            raw_fields = data.get('fields')
+            if isinstance(raw_fields, list):
+                raw_fields = ','.join(raw_fields)
+            fields = parse_fields(raw_fields, Station.RESPONSE_FIELDS)
+        except InvalidFieldsError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        index = get_station_index()
+        if index.is_ready:
+            index.ensure_fresh(mongo.db, get_catalog_version()['version'])
+            found = {sid: index.get(sid) for sid in station_ids}
+        else:
+            object_ids = [ObjectId(sid) for sid in station_ids if ObjectId.is_valid(sid)]
+            cursor = mongo.db.stations.find(
+                {'_id': {'$in': object_ids}}, projection_for(fields, Station.RESPONSE_FIELDS)
             )
-            
-            # Filter by max distance
-            if max_distance and distance > max_distance:
-                continue
-            
-            # Filter by charging type
-            if charging_type and charging_type != 'all':
-                has_type = any(
-                    charging_type.lower() in p.get('type', '').lower()
-                    for p in station.ports
-                )
-                if not has_type:
-                    continue
-            
-            stations.append(station.to_response_dict(distance=distance))
-        
-        # Sort results
-        if sort_by == 'distance':
-            stations.sort(key=lambda x: x.get('distance', float('inf')))
-        elif sort_by == 'rating':
-            stations.sort(key=lambda x: x.get('rating', 0), reverse=True)
+            found = {str(doc['_id']): doc for doc in cursor}
         
-        return jsonify({'success': True, 'data': stations})
+        stations = {
+            sid: Station.from_dict(doc).to_response_dict(fields=fields)
+            for sid, doc in found.items() if doc
+        }
+        missing = [sid for sid in station_ids if sid not in stations]
+        
+        return jsonify({'success': True, 'data': stations, 'missing': missing})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@stations_bp.route('/quotes', methods=['POST'])
+def get_station_quotes():
+    """Price a planned charge at many stations in one request, keyed by ID"""
+    try:
+        # Check if database is available
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
+        
+        data = request.get_json() or {}
+        station_ids = data.get('ids')
+        if not isinstance(station_ids, list) or not station_ids:
+            return jsonify({'success': False, 'error': 'ids must be a non-empty list'}), 400
+        station_ids = list(dict.fromkeys(str(i) for i in station_ids))
+        if len(station_ids) > MAX_BATCH_IDS:
+            return jsonify({'success': False, 'error': f'At most {MAX_BATCH_IDS} ids per request'}), 400
+        
+        start = datetime.utcnow()
+        if data.get('start'):
+            try:
+                start = datetime.fromisoformat(str(data['start']).replace('Z', '+00:00'))
+            except ValueError:
+                return jsonify({'success': False, 'error': 'start must be an ISO 8601 time'}), 400
+            if start.tzinfo is not None:
+                start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        duration_minutes = data.get('durationMinutes', 60)
+        energy_kwh = data.get('energyKwh')
+        if not isinstance(duration_minutes, (int, float)) or not 0 < duration_minutes <= MAX_QUOTE_MINUTES:
+            return jsonify({'success': False, 'error': f'durationMinutes must be between 1 and {MAX_QUOTE_MINUTES}'}), 400
+        if energy_kwh is not None and (not isinstance(energy_kwh, (int, float)) or energy_kwh < 0):
+            return jsonify({'success': False, 'error': 'energyKwh must be a non-negative number'}), 400
+        
+        tariffs = load_tariffs(station_ids)
+        quotes = {
+            sid: quote(tariff, data.get('chargingType'), start, duration_minutes, energy_kwh)
+            for sid, tariff in tariffs.items()
+        }
+        missing = [sid for sid in station_ids if sid not in quotes]
+        
+        return jsonify({'success': True, 'data': quotes, 'missing': missing})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -93,13 +481,26 @@ def get_station_by_id(station_id):
         if mongo.db is None:
             return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
-        station_data = mongo.db.stations.find_one({'_id': ObjectId(station_id)})
+        # Read from the in-process index when loaded so a 304 needs no station fetch
+        index = get_station_index()
+        if index.is_ready:
+            index.ensure_fresh(mongo.db, get_catalog_version()['version'])
+            station_data = index.get(station_id)
+        else:
+            station_data = mongo.db.stations.find_one({'_id': ObjectId(station_id)})
         
         if not station_data:
             return jsonify({'success': False, 'error': 'Station not found'}), 404
         
+        updated_at = station_data.get('updated_at') or station_data.get('created_at')
+        etag = f"station-{station_id}-{updated_at.isoformat() if updated_at else 0}"
+        cached = not_modified(etag, updated_at)
+        if cached is not None:
+            return cached
+        
         station = Station.from_dict(station_data)
-        return jsonify({'success': True, 'data': station.to_response_dict()})
+        response = jsonify({'success': True, 'data': station.to_response_dict()})
+        return cacheable(response, etag, updated_at)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -111,8 +512,15 @@ def get_stations_by_operator(operator_id):
         if mongo.db is None:
             return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
-        stations_data = list(mongo.db.stations.find({'operator_id': operator_id}))
-        stations = [Station.from_dict(data).to_response_dict() for data in stations_data]
+        try:
+            fields = parse_fields(request.args.get('fields'), Station.RESPONSE_FIELDS)
+        except InvalidFieldsError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        stations_data = list(mongo.db.stations.find(
+            {'operator_id': operator_id}, projection_for(fields, Station.RESPONSE_FIELDS)
+        ))
+        stations = [Station.from_dict(data).to_response_dict(fields=fields) for data in stations_data]
         
         return jsonify({'success': True, 'data': stations})
     except Exception as e:
@@ -134,6 +542,8 @@ def create_station():
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
         data = request.get_json()
+        if data.get('timezone') and not is_valid_timezone(data['timezone']):
+            return jsonify({'success': False, 'error': 'timezone must be an IANA name such as Asia/Kolkata'}), 400
         
         station = Station(
             name=data['name'],
@@ -146,16 +556,52 @@ def create_station():
             ports=data.get('ports', []),
             pricing=data.get('pricing', {}),
             peak_hours=data.get('peakHours'),
-            image=data.get('image')
+            image=data.get('image'),
+            timezone=data.get('timezone') or None
         )
         
         result = mongo.db.stations.insert_one(station.to_dict())
         station.id = str(result.inserted_id)
+        sync_station_ports(station.id, station.ports)
+        station_changed(station.id)
         
         return jsonify({'success': True, 'data': station.to_response_dict()}), 201
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@stations_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_stations_bulk():
+    """Bulk-create stations from an NDJSON or CSV body (operator/admin only)"""
+    try:
+        # Check if database is available
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
+        
+        user_id = get_jwt_identity()
+        user_data = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'role': 1})
+        
+        if not user_data or user_data.get('role') not in ['operator', 'admin']:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+        
+        upload_format = request.args.get('format') or ('csv' if 'csv' in request.mimetype else 'ndjson')
+        if upload_format not in ('csv', 'ndjson'):
+            return jsonify({'success': False, 'error': 'format must be csv or ndjson'}), 400
+        
+        # Rows are parsed and inserted while the body streams in
+        rows = read_csv(request.stream) if upload_format == 'csv' else read_ndjson(request.stream)
+        report = ImportReport()
+        try:
+            import_stations(mongo.db, rows, user_id, on_inserted=sync_stations, report=report)
+        finally:
+            # Chunks inserted before a failure must reach the catalog version and index too
+            if report.inserted:
+                catalog_reloaded()
+        
+        return jsonify({'success': True, 'data': report.to_response_dict()}), 201 if report.inserted else 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @stations_bp.route('/<station_id>', methods=['PUT'])
 @jwt_required()
 def update_station(station_id):
@@ -179,14 +625,24 @@ def update_station(station_id):
         
         # Update allowed fields
         allowed_fields = ['name', 'address', 'city', 'status', 'amenities', 
-                         'operating_hours', 'ports', 'pricing', 'peak_hours', 'image']
+                         'operating_hours', 'ports', 'pricing', 'peak_hours', 'timezone', 'image']
         update_data = {k: v for k, v in data.items() if k in allowed_fields}
+        if update_data.get('timezone') and not is_valid_timezone(update_data['timezone']):
+            return jsonify({'success': False, 'error': 'timezone must be an IANA name such as Asia/Kolkata'}), 400
         update_data['updated_at'] = datetime.utcnow()
+        if 'ports' in update_data:
+            update_data['port_types'] = Station.port_type_keys(update_data['ports'])
+            update_data['availability_summary'] = Station.summarize_ports(
+                update_data['ports'], update_data['updated_at']
+            )
         
         mongo.db.stations.update_one(
             {'_id': ObjectId(station_id)},
             {'$set': update_data}
         )
+        if 'ports' in update_data:
+            sync_station_ports(station_id, update_data['ports'])
+        station_changed(station_id)
         
         updated_station = mongo.db.stations.find_one({'_id': ObjectId(station_id)})
         station = Station.from_dict(updated_station)
@@ -195,6 +651,30 @@ def update_station(station_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@stations_bp.route('/<station_id>', methods=['DELETE'])
+@jwt_required()
+def delete_station(station_id):
+    """Delete a station (admin only)"""
+    try:
+        # Check if database is available
+        if mongo.db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
+        
+        user_id = get_jwt_identity()
+        user_data = mongo.db.users.find_one({'_id': ObjectId(user_id)})
+        if not user_data or user_data.get('role') != 'admin':
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+        
+        result = mongo.db.stations.delete_one({'_id': ObjectId(station_id)})
+        if result.deleted_count == 0:
+            return jsonify({'success': False, 'error': 'Station not found'}), 404
+        
+        station_deleted(station_id)
+        
+        return jsonify({'success': True, 'message': 'Station deleted'})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @stations_bp.route('/<station_id>/status', methods=['PUT'])
 @jwt_required()
 def update_station_status(station_id):
@@ -219,6 +699,8 @@ def update_station_status(station_id):
         if result.modified_count == 0:
             return jsonify({'success': False, 'error': 'Station not found'}), 404
         
+        station_changed(station_id)
+        
         return jsonify({'success': True, 'message': 'Station status updated'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -238,14 +720,11 @@ def update_port_status(station_id, port_id):
         if new_status not in ['available', 'busy', 'offline']:
             return jsonify({'success': False, 'error': 'Invalid status'}), 400
         
-        result = mongo.db.stations.update_one(
-            {'_id': ObjectId(station_id), 'ports.id': int(port_id)},
-            {'$set': {'ports.$.status': new_status, 'updated_at': datetime.utcnow()}}
-        )
-        
-        if result.modified_count == 0:
+        if set_port_status(station_id, int(port_id), new_status) is None:
             return jsonify({'success': False, 'error': 'Station or port not found'}), 404
         
+        station_changed(station_id)
+        
         return jsonify({'success': True, 'message': 'Port status updated'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
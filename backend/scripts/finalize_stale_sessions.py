@@ -0,0 +1,40 @@
+"""
+Finalize stale charging sessions for EVPulse
+Completes active sessions whose stop call never arrived. The API server does
+this every minute in the background; run this after downtime or from cron
+when the server's finalizer is not running.
+
+Usage:
+    python scripts/finalize_stale_sessions.py
+    python scripts/finalize_stale_sessions.py --grace-minutes 60
+"""
+
+import os
+import sys
+import argparse
+from datetime import timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from services.stale_sessions import STALE_SESSION_GRACE, finalize_stale_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--grace-minutes', type=int, default=int(STALE_SESSION_GRACE.total_seconds() // 60),
+        help='Minutes past the estimated completion before a session counts as stale'
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print("⏱️ Finalizing stale charging sessions...")
+        count = finalize_stale_sessions(grace=timedelta(minutes=args.grace_minutes))
+        print(f"✅ Finalized {count} session(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Rebuild materialized user charging statistics for EVPulse
+Recomputes the user_stats collection from completed sessions. The API builds
+the collection on startup when it is empty; run this any time the totals need
+repairing.
+
+Usage:
+    python scripts/rebuild_user_stats.py
+    python scripts/rebuild_user_stats.py --user <user_id>
+"""
+
+import os
+import sys
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, mongo
+from services.user_stats import rebuild_user_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--user', help='Rebuild a single user instead of everyone')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print("📊 Rebuilding user stats...")
+        rebuild_user_stats(mongo.db, args.user)
+        print(f"✅ user_stats now holds {mongo.db.user_stats.count_documents({})} user(s)")
+
+
+if __name__ == '__main__':
+    main()
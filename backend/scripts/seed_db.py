@@ -19,6 +19,7 @@ from models.booking import Booking
 from models.transaction import Transaction
 from models.review import Review
 from models.notification import Notification
+from services.user_stats import rebuild_user_stats
 
 def seed_database():
     """Seed the database with initial data"""
@@ -36,6 +37,7 @@ def seed_database():
         mongo.db.transactions.delete_many({})
         mongo.db.reviews.delete_many({})
         mongo.db.notifications.delete_many({})
+        mongo.db.user_stats.delete_many({})
         
         # Create users
         print("👤 Creating users...")
@@ -194,6 +196,7 @@ def seed_database():
                 'address': station_data['address'],
                 'city': station_data['city'],
                 'coordinates': station_data['coordinates'],
+                'location': Station.geo_point(station_data['coordinates']),
                 'operator_id': user_ids['operator'],
                 'status': station_data['status'],
                 'rating': station_data['rating'],
@@ -201,8 +204,11 @@ def seed_database():
                 'amenities': station_data['amenities'],
                 'operating_hours': station_data['operating_hours'],
                 'ports': station_data['ports'],
+                'port_types': Station.port_type_keys(station_data['ports']),
+                'availability_summary': Station.summarize_ports(station_data['ports']),
                 'pricing': station_data['pricing'],
                 'peak_hours': station_data['peak_hours'],
+                'timezone': 'America/Los_Angeles',
                 'image': station_data['image'],
                 'created_at': datetime.utcnow(),
                 'updated_at': datetime.utcnow()
@@ -381,6 +387,10 @@ def seed_database():
             mongo.db.notifications.insert_one(notif_doc)
         print(f"   ✓ Created {len(notifications_data)} notifications")
         
+        # Materialize charging stats for the seeded sessions
+        rebuild_user_stats(mongo.db)
+        print("   ✓ Rebuilt user stats")
+        
         print("\n✅ Database seeding completed successfully!")
         print("\n📋 Login credentials:")
         print("   User:     user@evpulse.com / user123")
@@ -0,0 +1,9 @@
+# Services Package
+from .distance import DistanceEngine
+from .station_index import StationIndex, get_station_index
+
+__all__ = [
+    'DistanceEngine',
+    'StationIndex',
+    'get_station_index'
+]
@@ -0,0 +1,291 @@
+"""
+Live port-availability store.
+
+Each station has one small document in ``station_availability`` holding its
+port ids in a fixed order plus two bitmaps (busy, offline) over those
+positions; a port whose bits are both clear is available. Port status writes
+go through set_port_status(), which updates the station's ``ports`` array
+and its denormalized ``availability_summary`` in one pipeline update, and
+flips the matching bits with $bit in the same transaction, so the three never
+disagree. Reads are served from an in-process mirror with a short TTL and
+fall back to a single $in query for the misses.
+
+Bitmaps are arrays of 63-bit words so stations with any number of ports fit
+in signed 64-bit integers.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from bson import ObjectId, Int64
+from pymongo import ReturnDocument, ReplaceOne, UpdateOne
+
+from app import mongo
+from models.station import Station
+from database import run_in_transaction
+
+PORT_STATUSES = ('available', 'busy', 'offline')
+WORD_BITS = 63
+MIRROR_TTL_SECONDS = 2.0
+MAX_AVAILABILITY_IDS = 500
+
+
+def _bit(position):
+    return position // WORD_BITS, 1 << (position % WORD_BITS)
+
+
+def availability_doc(station_id, ports, updated_at=None):
+    """Build the availability document for a station's ports array"""
+    ports = ports or []
+    words = max(1, -(-len(ports) // WORD_BITS))
+    busy = [0] * words
+    offline = [0] * words
+    for position, port in enumerate(ports):
+        word, mask = _bit(position)
+        if port.get('status') == 'busy':
+            busy[word] |= mask
+        elif port.get('status') == 'offline':
+            offline[word] |= mask
+    return {
+        '_id': str(station_id),
+        'port_ids': [p.get('id') for p in ports],
+        'busy': [Int64(w) for w in busy],
+        'offline': [Int64(w) for w in offline],
+        'version': 0,
+        'updated_at': updated_at or datetime.utcnow()
+    }
+
+
+def _status_update(position, status):
+    """$bit update moving one port position to the given status"""
+    word, mask = _bit(position)
+    clear = {'and': Int64(~mask)}
+    set_ = {'or': Int64(mask)}
+    bits = {
+        'available': {f'busy.{word}': clear, f'offline.{word}': clear},
+        'busy': {f'busy.{word}': set_, f'offline.{word}': clear},
+        'offline': {f'busy.{word}': clear, f'offline.{word}': set_},
+    }[status]
+    return {
+        '$bit': bits,
+        '$inc': {'version': 1},
+        '$set': {'updated_at': datetime.utcnow()}
+    }
+
+
+def decode(doc):
+    """Availability document -> API payload"""
+    busy = doc.get('busy') or []
+    offline = doc.get('offline') or []
+    ports = []
+    counts = {status: 0 for status in PORT_STATUSES}
+    for position, port_id in enumerate(doc.get('port_ids') or []):
+        word, mask = _bit(position)
+        if word < len(busy) and busy[word] & mask:
+            status = 'busy'
+        elif word < len(offline) and offline[word] & mask:
+            status = 'offline'
+        else:
+            status = 'available'
+        counts[status] += 1
+        ports.append({'id': port_id, 'status': status})
+    return {
+        'ports': ports,
+        'available': counts['available'],
+        'busy': counts['busy'],
+        'offline': counts['offline'],
+        'total': len(ports),
+        'version': doc.get('version', 0),
+        'updatedAt': doc['updated_at'].isoformat() if doc.get('updated_at') else None
+    }
+
+
+class AvailabilityMirror:
+    """Per-process copy of recently read or written availability documents"""
+
+    def __init__(self, ttl_seconds=MIRROR_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = {}  # station_id -> (fetched_at, decoded payload)
+
+    def put(self, doc):
+        with self._lock:
+            self._entries[doc['_id']] = (time.monotonic(), decode(doc))
+
+    def discard(self, station_id):
+        with self._lock:
+            self._entries.pop(str(station_id), None)
+
+    def get_many(self, station_ids):
+        """Return ({id: payload} for fresh entries, [ids that must be fetched])"""
+        now = time.monotonic()
+        hits, misses = {}, []
+        with self._lock:
+            for station_id in station_ids:
+                entry = self._entries.get(station_id)
+                if entry is not None and now - entry[0] < self.ttl_seconds:
+                    hits[station_id] = entry[1]
+                else:
+                    misses.append(station_id)
+        return hits, misses
+
+
+_mirror = AvailabilityMirror()
+
+
+def get_availability(station_ids):
+    """Availability for many stations: mirror hits plus one $in for the rest"""
+    hits, misses = _mirror.get_many(station_ids)
+    if misses:
+        for doc in mongo.db.station_availability.find({'_id': {'$in': misses}}):
+            _mirror.put(doc)
+            hits[doc['_id']] = decode(doc)
+    return hits
+
+
+def _port_update(port_id, status, now):
+    """Pipeline update setting one port's status and recomputing the station summary from it"""
+    return [
+        {'$set': {
+            'ports': {'$map': {'input': '$ports', 'as': 'p', 'in': {'$cond': [
+                {'$eq': ['$$p.id', {'$literal': port_id}]},
+                {'$mergeObjects': ['$$p', {'status': {'$literal': status}}]},
+                '$$p'
+            ]}}},
+            'updated_at': now
+        }},
+        {'$set': {'availability_summary': Station.summarize_ports_expression(now)}}
+    ]
+
+
+def set_port_status(station_id, port_id, status, session=None, expected=None):
+    """
+    Set one port's status on the station and in the availability store.
+
+    With expected, the change only applies if the port currently has that
+    status, which makes claiming a port a single conditional update.
+
+    Runs in its own transaction, or in the caller's when session is given
+    (the mirror entry is then dropped rather than refreshed, since the
+    caller's transaction may still abort).
+
+    Returns:
+        The station's decoded availability, or None if the station or port
+        does not exist (or the port's status is not expected)
+    """
+    # Pipeline update so the summary is recomputed from the new ports array atomically
+    update = _port_update(port_id, status, datetime.utcnow())
+    
+    criteria = {'_id': ObjectId(station_id), 'ports.id': port_id}
+    if expected is not None:
+        criteria = {'_id': ObjectId(station_id), 'ports': {'$elemMatch': {'id': port_id, 'status': expected}}}
+    
+    def work(session):
+        station = mongo.db.stations.find_one_and_update(
+            criteria,
+            update,
+            projection={'ports': 1},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if station is None:
+            return None
+
+        ports = station.get('ports') or []
+        position = next(i for i, p in enumerate(ports) if p.get('id') == port_id)
+        doc = mongo.db.station_availability.find_one_and_update(
+            {'_id': str(station_id), f'port_ids.{position}': port_id},
+            _status_update(position, status),
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if doc is None:
+            # Missing, or the ports array was replaced without a resync
+            doc = availability_doc(station_id, ports)
+            mongo.db.station_availability.replace_one(
+                {'_id': doc['_id']}, doc, upsert=True, session=session
+            )
+        return doc
+
+    if session is not None:
+        doc = work(session)
+        _mirror.discard(station_id)
+    else:
+        doc = run_in_transaction(work)
+        if doc is not None:
+            _mirror.put(doc)
+    return decode(doc) if doc is not None else None
+
+
+def set_ports_status(ports, status, session=None):
+    """
+    Set many ports to one status with a bulk write per collection.
+
+    Args:
+        ports: (station_id, port_id) pairs
+        status: New status for every port
+        session: Caller's transaction session, if any
+    """
+    ports = list(ports)
+    if not ports:
+        return
+    now = datetime.utcnow()
+    mongo.db.stations.bulk_write(
+        [UpdateOne({'_id': ObjectId(sid), 'ports.id': pid}, _port_update(pid, status, now)) for sid, pid in ports],
+        ordered=False,
+        session=session
+    )
+
+    # Rewrite the bitmaps of the touched stations from their new ports arrays
+    station_ids = list(dict.fromkeys(str(sid) for sid, _ in ports))
+    requests = []
+    for station in mongo.db.stations.find(
+        {'_id': {'$in': [ObjectId(sid) for sid in station_ids]}}, {'ports': 1}, session=session
+    ):
+        doc = availability_doc(station['_id'], station.get('ports'), now)
+        version = doc.pop('version')
+        requests.append(UpdateOne({'_id': doc.pop('_id')}, {'$set': doc, '$inc': {'version': version + 1}}, upsert=True))
+    if requests:
+        mongo.db.station_availability.bulk_write(requests, ordered=False, session=session)
+    for station_id in station_ids:
+        _mirror.discard(station_id)
+
+
+def sync_station_ports(station_id, ports):
+    """Rewrite a station's availability after its ports array was replaced"""
+    doc = availability_doc(station_id, ports)
+    mongo.db.station_availability.replace_one({'_id': doc['_id']}, doc, upsert=True)
+    _mirror.put(doc)
+
+
+def sync_stations(stations):
+    """Write availability documents for many newly inserted stations at once"""
+    requests = []
+    for station in stations:
+        doc = availability_doc(station['_id'], station.get('ports'))
+        requests.append(ReplaceOne({'_id': doc['_id']}, doc, upsert=True))
+    if requests:
+        mongo.db.station_availability.bulk_write(requests, ordered=False)
+
+
+def remove_station(station_id):
+    mongo.db.station_availability.delete_one({'_id': str(station_id)})
+    _mirror.discard(station_id)
+
+
+def rebuild_availability(db, batch_size=500):
+    """Recompute every station's availability document from its ports array"""
+    written = 0
+    batch = []
+    for station in db.stations.find({}, {'ports': 1}):
+        doc = availability_doc(station['_id'], station.get('ports'))
+        batch.append(ReplaceOne({'_id': doc['_id']}, doc, upsert=True))
+        if len(batch) >= batch_size:
+            db.station_availability.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.station_availability.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
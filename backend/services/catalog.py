@@ -0,0 +1,148 @@
+"""
+Station catalog change hooks.
+
+Every route that writes to the stations collection calls one of these so the
+in-process caches derived from the catalog stay in sync with MongoDB. Each
+write also bumps a catalog version counter shared by all worker processes;
+it drives HTTP validators (ETag/Last-Modified) and tells other workers'
+station indexes that they are behind.
+
+Clients keep a local copy current with sync tokens: a token records when it
+was issued and the catalog version at that moment, and the next poll returns
+only stations whose updated_at is newer plus tombstones of deleted stations.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+from app import mongo
+from database.indexes import STATION_TOMBSTONE_TTL_SECONDS
+from services.availability import remove_station
+from services.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from services.station_index import get_station_index, SYNC_OVERLAP
+from services.station_names import invalidate_station_name, clear_station_names
+
+logger = logging.getLogger('evpulse.services')
+
+CATALOG_COUNTER_ID = 'station_catalog'
+SYNC_TOKEN_SCOPE = 'station-sync'
+# Tokens older than this may have missed deletes whose tombstones have expired
+SYNC_TOKEN_MAX_AGE = timedelta(seconds=STATION_TOMBSTONE_TTL_SECONDS)
+
+
+class SyncTokenExpiredError(InvalidCursorError):
+    """Raised when a sync token predates the tombstone retention window"""
+
+
+def get_catalog_version():
+    """Return {'version', 'updated_at'} for the station catalog (one primary-key read)"""
+    doc = mongo.db.counters.find_one({'_id': CATALOG_COUNTER_ID})
+    if not doc:
+        return {'version': 0, 'updated_at': None}
+    return {'version': doc.get('version', 0), 'updated_at': doc.get('updated_at')}
+
+
+def bump_catalog_version():
+    """Atomically increment the catalog version and return the new value"""
+    doc = mongo.db.counters.find_one_and_update(
+        {'_id': CATALOG_COUNTER_ID},
+        {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc['version']
+
+
+def station_changed(station_id):
+    """Propagate a write to a single station"""
+    invalidate_station_name(station_id)
+    try:
+        version = bump_catalog_version()
+        index = get_station_index()
+        if index.is_ready:
+            index.refresh(mongo.db, station_id, version)
+    except Exception as e:
+        logger.warning(f"Catalog update failed for station {station_id}: {e}")
+
+
+def stations_changed(station_ids):
+    """Propagate writes to many stations with a single version bump"""
+    for station_id in station_ids:
+        invalidate_station_name(station_id)
+    try:
+        version = bump_catalog_version()
+        index = get_station_index()
+        if index.is_ready:
+            # One query pulls in every station written since the last sync
+            index.ensure_fresh(mongo.db, version)
+    except Exception as e:
+        logger.warning(f"Catalog update failed for {len(station_ids)} station(s): {e}")
+
+
+def station_deleted(station_id):
+    """Record a tombstone for delta sync and drop the station from derived caches"""
+    mongo.db.station_tombstones.update_one(
+        {'_id': str(station_id)},
+        {'$set': {'deleted_at': datetime.utcnow()}},
+        upsert=True
+    )
+    remove_station(station_id)
+    station_changed(station_id)
+
+
+def encode_sync_token(issued_at, version):
+    return encode_cursor([issued_at.isoformat(), version], SYNC_TOKEN_SCOPE)
+
+
+def decode_sync_token(token):
+    """
+    Returns:
+        (issued_at, catalog version)
+
+    Raises:
+        InvalidCursorError: malformed token
+        SyncTokenExpiredError: token is older than the tombstone retention
+    """
+    try:
+        issued_at, version = decode_cursor(token, SYNC_TOKEN_SCOPE)['p']
+        issued_at = datetime.fromisoformat(issued_at)
+        version = int(version)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursorError('Invalid sync token') from e
+    if issued_at < datetime.utcnow() - SYNC_TOKEN_MAX_AGE:
+        raise SyncTokenExpiredError('Sync token expired, reload the full catalog')
+    return issued_at, version
+
+
+def catalog_changes(since, since_version, projection=None):
+    """
+    Stations written and ids deleted since a sync token was issued.
+
+    Returns:
+        (station documents, deleted station ids, new sync token)
+    """
+    issued_at = datetime.utcnow()
+    version = get_catalog_version()['version']
+    if version == since_version:
+        # No write has completed since the token was issued
+        return [], [], encode_sync_token(issued_at, version)
+
+    # Overlap absorbs clock skew and writes that committed after their updated_at
+    window_start = since - SYNC_OVERLAP
+    stations = list(mongo.db.stations.find({'updated_at': {'$gte': window_start}}, projection))
+    deleted = [
+        t['_id'] for t in mongo.db.station_tombstones.find({'deleted_at': {'$gte': window_start}}, {'_id': 1})
+    ]
+    return stations, deleted, encode_sync_token(issued_at, version)
+
+
+def catalog_reloaded():
+    """Propagate a bulk write: bump the version and rebuild catalog caches from scratch"""
+    clear_station_names()
+    try:
+        version = bump_catalog_version()
+        get_station_index().build(mongo.db, version)
+    except Exception as e:
+        logger.warning(f"Station index rebuild failed: {e}")
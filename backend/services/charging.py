@@ -0,0 +1,168 @@
+"""
+Charging session lifecycle writes.
+
+start_session() claims the port with a conditional update that only matches
+while the port is available, then inserts the session, relying on a unique
+partial index (one active session per user) to reject a second concurrent
+start. Both writes run in one transaction, so no session ever exists without
+its port; without transactions a rejected insert hands the port back.
+Neither step needs a prior read or an application lock.
+
+complete_session() stops a session with one guarded find_one_and_update:
+only a session that is still active matches, so a repeated or concurrent
+stop finds nothing and cannot bill twice. The caller passes the session's
+station and charging type, which the update's filter also matches; the
+station's tariff comes from the in-process index, and the update pipeline
+computes the duration, the energy from the stored start time and meter
+values, and the cost, so stopping needs no read first and a session is never
+left completed without a price. Only a caller that does not know the station,
+or a session older than PRICED_SESSION_SPAN, costs one read of the session.
+The port release, the payment record, the notification and the user's totals
+are then written in the same transaction.
+"""
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app import mongo
+from database import run_in_transaction
+from models.notification import Notification
+from models.transaction import Transaction
+from services.availability import set_port_status
+from services.catalog import station_changed
+from services.session_events import publish_session
+from services.tariff import Tariff, charging_kind, load_tariffs
+from services.telemetry import final_meter_fields, get_telemetry_buffer
+from services.user_stats import record_completed_session
+
+# Stops priced without reading the session first cover sessions started this recently
+PRICED_SESSION_SPAN = timedelta(days=1)
+
+
+class ActiveSessionExistsError(Exception):
+    """The user already has an active charging session"""
+
+
+class PortUnavailableError(Exception):
+    """The requested port does not exist or is not available"""
+
+
+def start_session(session):
+    """
+    Claim a port and insert a new active session on it.
+
+    Args:
+        session: Session model instance (not yet inserted); its id is set
+
+    Raises:
+        ActiveSessionExistsError: if the user already has an active session
+        PortUnavailableError: if the port is missing, busy or offline
+    """
+    def work(txn):
+        if set_port_status(session.station_id, session.port_id, 'busy', session=txn, expected='available') is None:
+            raise PortUnavailableError('This port is not available')
+        try:
+            return mongo.db.sessions.insert_one(session.to_dict(), session=txn).inserted_id
+        except DuplicateKeyError:
+            if txn is None:
+                # No transaction to abort: hand the port back ourselves
+                set_port_status(session.station_id, session.port_id, 'available', expected='busy')
+            raise ActiveSessionExistsError('You already have an active charging session')
+
+    session.id = str(run_in_transaction(work))
+    station_changed(session.station_id)
+    return session
+
+
+def complete_session(session_id, station_id=None, charging_type=None):
+    """
+    Stop an active charging session and bill it.
+
+    Args:
+        session_id: Session to stop
+        station_id: The session's station, as known to the caller
+        charging_type: The session's charging type, as known to the caller
+
+    Returns:
+        The completed session document, or None if no active session has
+        that id (including one already stopped by an earlier call)
+    """
+    now = datetime.utcnow()
+    criteria = {'_id': ObjectId(session_id), 'status': 'active'}
+    since = now - PRICED_SESSION_SPAN
+    caller_knows_session = station_id is not None and charging_type is not None
+    if not caller_knows_session:
+        session_data = mongo.db.sessions.find_one(criteria, {'station_id': 1, 'start_time': 1, 'charging_type': 1})
+        if session_data is None:
+            return None
+        station_id, charging_type = session_data['station_id'], session_data.get('charging_type')
+        since = min(since, session_data['start_time'])
+    # The tariff priced into the update is only right for the station and charging type it matches
+    criteria.update({'station_id': station_id, 'charging_type': charging_type, 'start_time': {'$gte': since}})
+    tariff = load_tariffs([station_id]).get(str(station_id)) or Tariff()
+
+    buffer = get_telemetry_buffer()
+    pending = buffer.pending(session_id)
+    update = [
+        {'$set': {
+            'status': 'completed',
+            'end_time': now,
+            'duration': {'$toInt': {'$floor': {'$divide': [{'$subtract': [now, '$start_time']}, 60000]}}},
+            'progress': 100,
+            'updated_at': now
+        }},
+        {'$set': final_meter_fields(pending)},
+        {'$set': {'cost': tariff.cost_expression(charging_kind(charging_type), now, since)}}
+    ]
+
+    def work(session):
+        session_data = mongo.db.sessions.find_one_and_update(
+            criteria,
+            update,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if session_data is None:
+            return None
+        cost = session_data['cost']
+
+        set_port_status(session_data['station_id'], session_data['port_id'], 'available', session=session)
+
+        transaction = Transaction(
+            user_id=session_data['user_id'],
+            amount=cost,
+            transaction_type='charging',
+            payment_method=session_data.get('payment_method', 'Wallet'),
+            description="Charging session at station",
+            session_id=str(session_data['_id'])
+        )
+        mongo.db.transactions.insert_one(transaction.to_dict(), session=session)
+
+        notification = Notification(
+            user_id=session_data['user_id'],
+            notification_type='charging_complete',
+            title='Charging Complete',
+            message=f'Your vehicle has finished charging. Total: ${cost}',
+            action_url='/user/history'
+        )
+        mongo.db.notifications.insert_one(notification.to_dict(), session=session)
+
+        record_completed_session(
+            session_data['user_id'], session_data['energy_delivered'], cost, session_data['duration'],
+            session=session
+        )
+        return session_data
+
+    session_data = run_in_transaction(work)
+    if session_data is None and caller_knows_session:
+        # Wrong station or type from the caller, or a session older than the priced span
+        return complete_session(session_id)
+    if session_data is not None:
+        # Only the call that completed the session drops the buffered reading it billed
+        buffer.discard_session(session_id)
+        station_changed(session_data['station_id'])
+        publish_session(session_data)
+    return session_data
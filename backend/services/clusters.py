@@ -0,0 +1,127 @@
+"""
+Per-zoom station clustering for map viewports.
+
+Each zoom level gets a lat/lng grid whose cells are a quarter of a map tile
+wide. Cells keep running aggregates (station count, coordinate sums, port
+totals), so a viewport query only visits the cells it covers and returns one
+marker per cell; the payload tracks the viewport, not the catalog size.
+"""
+
+import math
+
+from services.geo import station_lat_lng
+
+MIN_ZOOM = 0
+MAX_ZOOM = 20
+CELLS_PER_TILE = 4
+
+
+def _port_counts(station):
+    summary = station.get('availability_summary')
+    if summary is not None:
+        return summary.get('available', 0), summary.get('total', 0)
+    ports = station.get('ports') or []
+    available = sum(1 for p in ports if p.get('status') == 'available')
+    return available, len(ports)
+
+
+class ClusterGrid:
+    """Aggregated station cells for a single zoom level"""
+
+    def __init__(self, zoom):
+        self.zoom = zoom
+        self.cell_deg = 360.0 / (2 ** zoom) / CELLS_PER_TILE
+        self._cols = int(math.ceil(360.0 / self.cell_deg))
+        self.cells = {}  # (row, col) -> aggregate dict
+
+    def _cell(self, lat, lng):
+        row = int(math.floor((lat + 90.0) / self.cell_deg))
+        col = int(math.floor((lng + 180.0) / self.cell_deg)) % self._cols
+        return row, col
+
+    def add(self, station_id, station):
+        point = station_lat_lng(station)
+        if point is None:
+            return
+        lat, lng = point
+        available, total = _port_counts(station)
+        cell = self.cells.setdefault(self._cell(lat, lng), {
+            'count': 0, 'lat_sum': 0.0, 'lng_sum': 0.0,
+            'available': 0, 'total': 0, 'ids': set()
+        })
+        cell['count'] += 1
+        cell['lat_sum'] += lat
+        cell['lng_sum'] += lng
+        cell['available'] += available
+        cell['total'] += total
+        cell['ids'].add(station_id)
+
+    def remove(self, station_id, station):
+        point = station_lat_lng(station)
+        if point is None:
+            return
+        lat, lng = point
+        key = self._cell(lat, lng)
+        cell = self.cells.get(key)
+        if cell is None or station_id not in cell['ids']:
+            return
+        available, total = _port_counts(station)
+        cell['count'] -= 1
+        cell['lat_sum'] -= lat
+        cell['lng_sum'] -= lng
+        cell['available'] -= available
+        cell['total'] -= total
+        cell['ids'].discard(station_id)
+        if not cell['ids']:
+            del self.cells[key]
+
+    def _col_ranges(self, min_lng, max_lng):
+        """Column index ranges covering the bbox, split at the antimeridian"""
+        if min_lng <= max_lng:
+            spans = [(min_lng, max_lng)]
+        else:
+            spans = [(min_lng, 180.0), (-180.0, max_lng)]
+        ranges = []
+        for lo, hi in spans:
+            col_lo = int(math.floor((lo + 180.0) / self.cell_deg))
+            col_hi = min(int(math.floor((hi + 180.0) / self.cell_deg)), self._cols - 1)
+            ranges.append((col_lo, col_hi))
+        return ranges
+
+    def query(self, min_lat, min_lng, max_lat, max_lng):
+        """Return one marker per non-empty cell intersecting the bbox"""
+        row_lo = int(math.floor((min_lat + 90.0) / self.cell_deg))
+        row_hi = int(math.floor((max_lat + 90.0) / self.cell_deg))
+        col_ranges = self._col_ranges(min_lng, max_lng)
+        span = (row_hi - row_lo + 1) * sum(hi - lo + 1 for lo, hi in col_ranges)
+
+        if span <= len(self.cells):
+            keys = (
+                (row, col)
+                for row in range(row_lo, row_hi + 1)
+                for lo, hi in col_ranges
+                for col in range(lo, hi + 1)
+            )
+            hits = [(key, self.cells[key]) for key in keys if key in self.cells]
+        else:
+            # Sparse viewport at a deep zoom - scanning occupied cells is cheaper
+            hits = [
+                (key, cell) for key, cell in self.cells.items()
+                if row_lo <= key[0] <= row_hi
+                and any(lo <= key[1] <= hi for lo, hi in col_ranges)
+            ]
+
+        markers = []
+        for (row, col), cell in hits:
+            marker = {
+                'cell': f"{self.zoom}/{row}/{col}",
+                'lat': round(cell['lat_sum'] / cell['count'], 6),
+                'lng': round(cell['lng_sum'] / cell['count'], 6),
+                'count': cell['count'],
+                'availablePorts': cell['available'],
+                'totalPorts': cell['total']
+            }
+            if cell['count'] == 1:
+                marker['stationId'] = next(iter(cell['ids']))
+            markers.append(marker)
+        return markers
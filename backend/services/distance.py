@@ -0,0 +1,124 @@
+"""
+Vectorized great-circle distance engine.
+
+Station coordinates are held in contiguous NumPy arrays (radians plus the
+precomputed cosine of latitude) so distances from one or many query points
+to thousands of stations are computed in a single array pass instead of a
+Python loop over scalar haversine calls.
+"""
+
+import numpy as np
+
+from services.geo import EARTH_RADIUS_KM
+
+
+class DistanceEngine:
+    """Batched haversine distances to a fixed set of points"""
+
+    def __init__(self, lats, lngs):
+        self.lat_rad = np.ascontiguousarray(np.radians(np.asarray(lats, dtype=np.float64)))
+        self.lng_rad = np.ascontiguousarray(np.radians(np.asarray(lngs, dtype=np.float64)))
+        self.cos_lat = np.cos(self.lat_rad)
+
+    def __len__(self):
+        return len(self.lat_rad)
+
+    def _select(self, rows):
+        if rows is None:
+            return self.lat_rad, self.lng_rad, self.cos_lat
+        return self.lat_rad[rows], self.lng_rad[rows], self.cos_lat[rows]
+
+    def distances(self, lat, lng, rows=None):
+        """
+        Distances in km from one query point.
+
+        Args:
+            lat, lng: Query point in degrees
+            rows: Optional integer array restricting the computation to a subset of points
+
+        Returns:
+            1-D float array aligned with rows (or with every point when rows is None)
+        """
+        lat_rad, lng_rad, cos_lat = self._select(rows)
+        q_lat = np.radians(lat)
+        q_lng = np.radians(lng)
+
+        a = (np.sin((lat_rad - q_lat) / 2) ** 2
+             + np.cos(q_lat) * cos_lat * np.sin((lng_rad - q_lng) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def distance_matrix(self, lats, lngs, rows=None):
+        """
+        Distances in km from many query points at once.
+
+        Returns:
+            2-D float array of shape (len(lats), number of points)
+        """
+        lat_rad, lng_rad, cos_lat = self._select(rows)
+        q_lat = np.radians(np.asarray(lats, dtype=np.float64))[:, np.newaxis]
+        q_lng = np.radians(np.asarray(lngs, dtype=np.float64))[:, np.newaxis]
+
+        a = (np.sin((lat_rad - q_lat) / 2) ** 2
+             + np.cos(q_lat) * cos_lat * np.sin((lng_rad - q_lng) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def corridor_distances(route_lats, route_lngs, lats, lngs, chunk_cells=2_000_000):
+    """
+    Distance from each point to a polyline and the point's position along it.
+
+    Every segment is projected onto a local equirectangular plane scaled by
+    the cosine of its mid latitude, which is accurate to well under 1% for
+    segment lengths seen in road routes. Work is chunked over segments so
+    memory stays bounded for long routes.
+
+    Args:
+        route_lats, route_lngs: Polyline vertices in degrees (at least one)
+        lats, lngs: Points to measure in degrees
+
+    Returns:
+        (distance_km, offset_km, route_length_km) where distance_km and
+        offset_km are arrays aligned with the points and offset_km is the
+        distance along the route to the closest position on it
+    """
+    route_lats = np.asarray(route_lats, dtype=np.float64)
+    route_lngs = np.asarray(route_lngs, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    km_per_deg = np.radians(EARTH_RADIUS_KM)
+
+    if len(route_lats) == 1:
+        route_lats = np.repeat(route_lats, 2)
+        route_lngs = np.repeat(route_lngs, 2)
+
+    # Segment vectors in km on each segment's local plane
+    a_lat, a_lng = route_lats[:-1], route_lngs[:-1]
+    cos_mid = np.cos(np.radians((route_lats[:-1] + route_lats[1:]) / 2))
+    seg_x = ((route_lngs[1:] - a_lng + 180) % 360 - 180) * cos_mid * km_per_deg
+    seg_y = (route_lats[1:] - a_lat) * km_per_deg
+    seg_len = np.hypot(seg_x, seg_y)
+    seg_len_sq = np.where(seg_len > 0, seg_len ** 2, 1.0)
+    seg_start = np.concatenate(([0.0], np.cumsum(seg_len)[:-1]))
+
+    best_dist = np.full(len(lats), np.inf)
+    best_offset = np.zeros(len(lats))
+    if len(lats) == 0:
+        return best_dist, best_offset, float(seg_len.sum())
+
+    step = max(1, chunk_cells // len(lats))
+    for lo in range(0, len(seg_len), step):
+        hi = min(lo + step, len(seg_len))
+        # Shapes: (segments, points)
+        px = (((lngs - a_lng[lo:hi, None]) + 180) % 360 - 180) * cos_mid[lo:hi, None] * km_per_deg
+        py = (lats - a_lat[lo:hi, None]) * km_per_deg
+        t = np.clip((px * seg_x[lo:hi, None] + py * seg_y[lo:hi, None]) / seg_len_sq[lo:hi, None], 0.0, 1.0)
+        dist = np.hypot(px - t * seg_x[lo:hi, None], py - t * seg_y[lo:hi, None])
+
+        nearest = np.argmin(dist, axis=0)
+        cols = np.arange(len(lats))
+        chunk_dist = dist[nearest, cols]
+        better = chunk_dist < best_dist
+        best_dist[better] = chunk_dist[better]
+        best_offset[better] = (seg_start[lo:hi][nearest] + t[nearest, cols] * seg_len[lo:hi][nearest])[better]
+
+    return best_dist, best_offset, float(seg_len.sum())
@@ -0,0 +1,61 @@
+"""
+Sparse fieldsets for list endpoints (?fields=name,rating,distance).
+
+A model's RESPONSE_FIELDS maps each camelCase response key to the document
+fields it is built from. The requested keys become a MongoDB projection so
+unused fields are never read or transferred, and the model's serializer
+emits only those keys.
+"""
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when ?fields= names a key the endpoint does not serve"""
+
+
+def parse_fields(raw_fields, allowed):
+    """
+    Parse a comma-separated fields parameter.
+
+    Args:
+        raw_fields: Query string value (None or empty means all fields)
+        allowed: Response keys the endpoint can emit
+
+    Returns:
+        Set of requested keys (always including 'id'), or None for all fields
+    """
+    if not raw_fields:
+        return None
+    fields = {f.strip() for f in raw_fields.split(',') if f.strip()}
+    unknown = fields.difference(allowed)
+    if unknown:
+        raise InvalidFieldsError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    fields.add('id')
+    return fields
+
+
+def projection_for(fields, field_map, required=()):
+    """
+    MongoDB projection covering the requested keys.
+
+    Args:
+        fields: Result of parse_fields (None means no projection)
+        field_map: Response key -> tuple of document fields
+        required: Extra document fields the route itself reads
+
+    Returns:
+        Projection dict, or None to read whole documents
+    """
+    if fields is None:
+        return None
+    projection = {'_id': 1}
+    for key in fields:
+        for name in field_map.get(key, ()):
+            projection[name] = 1
+    for name in required:
+        projection[name] = 1
+    return projection
+
+
+def wants(fields, key):
+    """True when key is part of the response (all keys are when fields is None)"""
+    return fields is None or key in fields
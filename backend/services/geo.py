@@ -0,0 +1,88 @@
+"""
+Geographic helpers shared by the station services.
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two coordinates in km (unrounded)"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+
+    a = math.sin(delta_lat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def station_lat_lng(station):
+    """Return (lat, lng) of a raw station document, or None if it has no usable coordinates"""
+    coordinates = station.get('coordinates') or {}
+    lat = coordinates.get('lat')
+    lng = coordinates.get('lng')
+    if lat is None or lng is None:
+        return None
+    try:
+        return float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Return (min_lat, max_lat, min_lng, max_lng) enclosing a circle.
+    Longitude bounds are None when the circle wraps a pole or spans the whole globe.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE
+    min_lat = max(lat - delta_lat, -90.0)
+    max_lat = min(lat + delta_lat, 90.0)
+
+    # Widest longitude extent of the circle (reached above/below its centre latitude)
+    angular = radius_km / EARTH_RADIUS_KM
+    cos_lat = math.cos(math.radians(lat))
+    if max_lat >= 90.0 or min_lat <= -90.0 or math.sin(angular) >= cos_lat:
+        return min_lat, max_lat, None, None
+
+    delta_lng = math.degrees(math.asin(math.sin(angular) / cos_lat))
+    return min_lat, max_lat, lng - delta_lng, lng + delta_lng
+
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decode a Google encoded polyline into [(lat, lng), ...].
+
+    Raises:
+        ValueError: if the string is truncated or contains invalid characters
+    """
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    length = len(encoded)
+
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    raise ValueError('Truncated polyline')
+                byte = ord(encoded[index]) - 63
+                index += 1
+                if byte < 0 or byte > 63:
+                    raise ValueError('Invalid polyline character')
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+
+    return points
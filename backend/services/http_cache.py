@@ -0,0 +1,58 @@
+"""
+HTTP conditional-request helpers (ETag / Last-Modified / Cache-Control).
+
+Routes compute validators from cheap metadata first and call
+not_modified() before building the body, so an unchanged resource is
+answered with 304 without querying or serializing it.
+"""
+
+from datetime import timezone
+
+from flask import request, Response
+
+# Shared caches may serve a response this long before revalidating with the ETag
+DEFAULT_MAX_AGE = 10
+STALE_WHILE_REVALIDATE = 30
+
+
+def _http_date(last_modified):
+    """Normalize a naive-UTC datetime to the whole-second precision HTTP dates carry"""
+    if last_modified is None:
+        return None
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0)
+
+
+def _apply_headers(response, etag, last_modified, max_age):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    response.headers['Cache-Control'] = (
+        f'public, max-age={max_age}, stale-while-revalidate={STALE_WHILE_REVALIDATE}'
+    )
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def not_modified(etag, last_modified=None, max_age=DEFAULT_MAX_AGE):
+    """
+    Return a 304 response if the client's cached copy is still current, else None.
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        fresh = _http_date(last_modified) <= request.if_modified_since
+    else:
+        fresh = False
+
+    if not fresh:
+        return None
+    return _apply_headers(Response(status=304), etag, last_modified, max_age)
+
+
+def cacheable(response, etag, last_modified=None, max_age=DEFAULT_MAX_AGE):
+    """Attach validators and Cache-Control to a full response"""
+    return _apply_headers(response, etag, last_modified, max_age)
@@ -0,0 +1,67 @@
+"""
+Opaque keyset-pagination cursors.
+
+A cursor carries the sort key of the last item on a page plus a fingerprint of
+the query that produced it, encoded as URL-safe base64 JSON. Clients treat it
+as an opaque string and pass it back unchanged to fetch the next page.
+"""
+
+import base64
+import hashlib
+import json
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor cannot be decoded or belongs to a different query"""
+
+
+def query_fingerprint(params):
+    """Short stable hash of the query parameters a cursor is valid for"""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(position, fingerprint, **extra):
+    """
+    Build an opaque cursor.
+
+    Args:
+        position: JSON-serializable sort key of the last returned item
+        fingerprint: query_fingerprint() of the request
+        extra: Additional JSON-serializable fields to carry along
+    """
+    payload = dict(extra, p=position, q=fingerprint)
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, fingerprint):
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Returns:
+        The payload dict (position under 'p')
+
+    Raises:
+        InvalidCursorError: if the token is malformed or was issued for another query
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError('Invalid cursor') from e
+    if not isinstance(payload, dict) or 'p' not in payload:
+        raise InvalidCursorError('Invalid cursor')
+    if payload.get('q') != fingerprint:
+        raise InvalidCursorError('Cursor does not match the current query')
+    return payload
+
+
+def parse_limit(raw_limit, cursor=None):
+    """Clamp a requested page size; a cursor without a limit uses the default page size"""
+    if raw_limit is None or raw_limit <= 0:
+        return DEFAULT_PAGE_LIMIT if cursor else None
+    return min(raw_limit, MAX_PAGE_LIMIT)
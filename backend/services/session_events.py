@@ -0,0 +1,175 @@
+"""
+In-process pub/sub of live charging-session progress.
+
+Each watched session has one channel holding only the latest progress
+payload and a sequence number, guarded by its own Condition. Session writes
+in this process (telemetry flushes, stops, the stale-session finalizer)
+publish into the channel and wake its subscribers; a subscriber that falls
+behind simply gets the newest payload. An idle subscriber therefore costs a
+sequence number and a wait on a condition, and no queue grows behind it.
+Channels exist only while someone is subscribed, so publishing for an
+unwatched session is a dictionary miss.
+
+Writes made by other worker processes are not seen here; streams re-read
+the session document when their channel has been quiet for a while.
+
+Streams are opened with EventSource, which cannot send headers, so the
+client first exchanges its access token for a stream token: signed,
+bound to one session and valid for STREAM_TOKEN_TTL_SECONDS, so the token
+that ends up in URLs and access logs is worthless elsewhere and soon after.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from models.session import Session
+
+STREAM_TOKEN_TTL_SECONDS = 60
+
+# Response fields carried by stream events
+STREAM_FIELDS = {
+    'id', 'status', 'progress', 'energyDelivered', 'powerKw', 'batteryEnd',
+    'estimatedCompletion', 'cost', 'endTime', 'lastReadingAt'
+}
+STREAM_PROJECTION = {
+    'status': 1, 'progress': 1, 'energy_delivered': 1, 'power_kw': 1, 'battery_end': 1,
+    'estimated_completion': 1, 'cost': 1, 'end_time': 1, 'last_reading_at': 1
+}
+
+
+def stream_payload(session_data):
+    """Stream event payload for a session document"""
+    return Session.from_dict(session_data).to_response_dict(fields=STREAM_FIELDS)
+
+
+def _estimated_completion(previous, reading):
+    """Project a full battery from the state-of-charge rise since the previous reading"""
+    if reading['soc'] is None or previous.get('batteryEnd') is None or not previous.get('lastReadingAt'):
+        return previous.get('estimatedCompletion')
+    last_ts = datetime.fromisoformat(previous['lastReadingAt'])
+    elapsed = (reading['ts'] - last_ts).total_seconds()
+    rise = reading['soc'] - previous['batteryEnd']
+    if elapsed <= 0 or rise <= 0:
+        return previous.get('estimatedCompletion')
+    remaining = max(0.0, 100 - reading['soc'])
+    return (reading['ts'] + timedelta(seconds=remaining * elapsed / rise)).isoformat()
+
+
+def _stream_serializer(secret_key):
+    return URLSafeTimedSerializer(secret_key, salt='session-stream')
+
+
+def issue_stream_token(secret_key, session_id, user_id):
+    """Short-lived token allowing user_id to open the stream of one session"""
+    return _stream_serializer(secret_key).dumps({'session_id': str(session_id), 'user_id': str(user_id)})
+
+
+def verify_stream_token(secret_key, token, session_id):
+    """
+    Check a stream token for a session.
+
+    Returns:
+        The user id it was issued to, or None if it is invalid, expired or
+        for another session
+    """
+    try:
+        claims = _stream_serializer(secret_key).loads(token or '', max_age=STREAM_TOKEN_TTL_SECONDS)
+    except BadSignature:
+        return None
+    if not isinstance(claims, dict) or claims.get('session_id') != str(session_id):
+        return None
+    return claims.get('user_id')
+
+
+class _Channel:
+    __slots__ = ('condition', 'seq', 'payload', 'subscribers')
+
+    def __init__(self, payload):
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.payload = payload
+        self.subscribers = 0
+
+
+class SessionEventHub:
+    """Latest-value channels keyed by session id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def __len__(self):
+        return len(self._channels)
+
+    def subscribe(self, session_id, payload):
+        """Join (or open) a session's channel; payload seeds a new channel"""
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None:
+                channel = self._channels[session_id] = _Channel(payload)
+            channel.subscribers += 1
+            return channel
+
+    def unsubscribe(self, session_id, channel):
+        with self._lock:
+            channel.subscribers -= 1
+            if channel.subscribers <= 0 and self._channels.get(session_id) is channel:
+                del self._channels[session_id]
+
+    def publish(self, session_id, changes):
+        """Merge changes into the session's latest payload and wake its subscribers"""
+        channel = self._channels.get(session_id)
+        if channel is None:
+            return
+        with channel.condition:
+            payload = changes(channel.payload) if callable(changes) else changes
+            if all(channel.payload.get(k) == v for k, v in payload.items()):
+                return
+            channel.payload = {**channel.payload, **payload}
+            channel.seq += 1
+            channel.condition.notify_all()
+
+    def wait(self, channel, seq, timeout):
+        """
+        Block until the channel moves past seq or timeout passes.
+
+        Returns:
+            (seq, payload) of the newest update, or None on timeout
+        """
+        with channel.condition:
+            if channel.seq == seq:
+                channel.condition.wait(timeout)
+            if channel.seq == seq:
+                return None
+            return channel.seq, channel.payload
+
+
+_hub = SessionEventHub()
+
+
+def get_session_event_hub():
+    return _hub
+
+
+def publish_session(session_data):
+    """Publish a session document's current state (fields it lacks keep their last value)"""
+    payload = {k: v for k, v in stream_payload(session_data).items() if v is not None}
+    _hub.publish(str(session_data['_id']), payload)
+
+
+def publish_reading(session_id, reading):
+    """Publish a meter reading applied to an active session"""
+    def changes(previous):
+        update = {
+            'energyDelivered': max(previous.get('energyDelivered') or 0, round(reading['energy_kwh'], 3)),
+            'lastReadingAt': reading['ts'].isoformat(),
+            'estimatedCompletion': _estimated_completion(previous, reading)
+        }
+        if reading['power_kw'] is not None:
+            update['powerKw'] = reading['power_kw']
+        if reading['soc'] is not None:
+            update['progress'] = update['batteryEnd'] = round(reading['soc'])
+        return update
+    _hub.publish(str(session_id), changes)
@@ -0,0 +1,225 @@
+"""
+Finalizer for charging sessions whose stop call never arrived.
+
+A session that is still active STALE_SESSION_GRACE after its estimated
+completion, and has sent no meter reading in that time, is closed by
+finalize_stale_sessions(). Candidates come from the (status,
+estimated_completion) index a batch at a time; the batch is completed with
+one bulk write guarded on status, so a stop that races the finalizer wins
+and is never billed twice. Port releases, payment records, notifications and
+user totals for the sessions actually finalized are then written with one
+bulk write or insert_many each, in the same transaction.
+
+SessionFinalizer runs this in a daemon thread, started by the server
+entrypoints only. Every worker process may run one; a lease document in
+``job_leases`` lets one of them work at a time (the status guard would keep
+them from finalizing a session twice anyway), and another takes over once
+the holder stops renewing it.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app import mongo
+from database import run_in_transaction
+from models.notification import Notification
+from models.transaction import Transaction
+from services.availability import set_ports_status
+from services.catalog import stations_changed
+from services.session_events import publish_session
+from services.tariff import Tariff, load_tariffs, price_session
+from services.telemetry import ESTIMATED_KWH_PER_MINUTE, get_telemetry_buffer
+from services.user_stats import record_completed_sessions
+
+logger = logging.getLogger('evpulse.services')
+
+STALE_SESSION_GRACE = timedelta(minutes=30)
+FINALIZE_INTERVAL_SECONDS = 60
+FINALIZE_BATCH_SIZE = 200
+FINALIZER_LEASE = 'session-finalizer'
+# A finalizer that misses this many intervals loses its lease to another worker
+FINALIZER_LEASE_INTERVALS = 3
+
+_CANDIDATE_PROJECTION = {
+    'user_id': 1, 'station_id': 1, 'port_id': 1, 'start_time': 1, 'estimated_completion': 1,
+    'last_reading_at': 1, 'energy_delivered': 1, 'charging_type': 1, 'payment_method': 1
+}
+
+
+def _closing_fields(session_data, tariff):
+    """End time, duration, energy and cost for a session closed by the finalizer"""
+    # Peeked only: the reading is discarded once the session is actually finalized
+    pending = get_telemetry_buffer().pending(str(session_data['_id']))
+    start = session_data['start_time']
+    # Bill up to the last sign of charging: the newest reading, else the estimate
+    end = session_data.get('last_reading_at') or session_data['estimated_completion']
+    energy = session_data.get('energy_delivered') or 0
+    if pending is not None:
+        end = max(end, pending['ts'])
+        energy = max(energy, pending['energy_kwh'])
+    end = max(end, start)
+    duration = int((end - start).total_seconds() / 60)
+    if pending is not None or session_data.get('last_reading_at') is not None:
+        energy = round(energy, 3)
+    else:
+        energy = round(duration * ESTIMATED_KWH_PER_MINUTE, 1)
+
+    fields = {'end_time': end, 'duration': duration, 'energy_delivered': energy}
+    fields['cost'] = price_session(tariff, {**session_data, **fields})
+    return fields
+
+
+def _finalize_batch(now, cutoff, batch_size):
+    """Finalize up to batch_size stale sessions. Returns (candidates seen, sessions finalized)."""
+    candidates = list(mongo.db.sessions.find(
+        {
+            'status': 'active',
+            'estimated_completion': {'$lt': cutoff},
+            'last_reading_at': {'$not': {'$gte': cutoff}}
+        },
+        _CANDIDATE_PROJECTION
+    ).limit(batch_size))
+    if not candidates:
+        return 0, []
+
+    tariffs = load_tariffs({s['station_id'] for s in candidates})
+    batch_id = ObjectId()
+    closed = {}
+    updates = []
+    for session_data in candidates:
+        fields = _closing_fields(session_data, tariffs.get(str(session_data['station_id'])) or Tariff())
+        closed[session_data['_id']] = {**session_data, **fields}
+        updates.append(UpdateOne(
+            {'_id': session_data['_id'], 'status': 'active'},
+            {'$set': {
+                **fields,
+                'status': 'completed',
+                'progress': 100,
+                'stop_reason': 'timeout',
+                'finalize_batch': batch_id,
+                'updated_at': now
+            }}
+        ))
+
+    def work(session):
+        mongo.db.sessions.bulk_write(updates, ordered=False, session=session)
+        # Sessions stopped concurrently kept their own batch marker (or none)
+        finalized = [
+            closed[doc['_id']] for doc in mongo.db.sessions.find(
+                {'_id': {'$in': list(closed)}, 'finalize_batch': batch_id}, {'_id': 1}, session=session
+            )
+        ]
+        if not finalized:
+            return finalized
+
+        set_ports_status([(s['station_id'], s['port_id']) for s in finalized], 'available', session=session)
+        mongo.db.transactions.insert_many([
+            Transaction(
+                user_id=s['user_id'],
+                amount=s['cost'],
+                transaction_type='charging',
+                payment_method=s.get('payment_method', 'Wallet'),
+                description="Charging session at station (closed automatically)",
+                session_id=str(s['_id'])
+            ).to_dict()
+            for s in finalized
+        ], ordered=False, session=session)
+        mongo.db.notifications.insert_many([
+            Notification(
+                user_id=s['user_id'],
+                notification_type='charging_complete',
+                title='Charging Session Closed',
+                message=f"Your charging session was closed automatically after it stopped responding. Total: ${s['cost']}",
+                action_url='/user/history'
+            ).to_dict()
+            for s in finalized
+        ], ordered=False, session=session)
+        record_completed_sessions(finalized, session=session)
+        return finalized
+
+    finalized = run_in_transaction(work)
+    buffer = get_telemetry_buffer()
+    for s in finalized:
+        buffer.discard_session(str(s['_id']))
+    if finalized:
+        stations_changed(list({str(s['station_id']) for s in finalized}))
+        for s in finalized:
+            publish_session({**s, 'status': 'completed', 'progress': 100})
+    return len(candidates), finalized
+
+
+def finalize_stale_sessions(grace=STALE_SESSION_GRACE, batch_size=FINALIZE_BATCH_SIZE):
+    """
+    Complete every active session that is past its estimated completion by
+    more than grace and has not reported telemetry since.
+
+    Returns:
+        Number of sessions finalized
+    """
+    now = datetime.utcnow()
+    cutoff = now - grace
+    total = 0
+    while True:
+        seen, finalized = _finalize_batch(now, cutoff, batch_size)
+        total += len(finalized)
+        if seen < batch_size:
+            return total
+
+
+class SessionFinalizer:
+    """Daemon thread running finalize_stale_sessions() on an interval"""
+
+    def __init__(self, interval=FINALIZE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.owner = str(ObjectId())
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='session-finalizer')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _acquire_lease(self):
+        """Take or renew the finalizer lease. Returns whether this finalizer holds it."""
+        now = datetime.utcnow()
+        try:
+            mongo.db.job_leases.update_one(
+                {'_id': FINALIZER_LEASE, '$or': [{'owner': self.owner}, {'expires_at': {'$lt': now}}]},
+                {'$set': {
+                    'owner': self.owner,
+                    'expires_at': now + timedelta(seconds=self.interval * FINALIZER_LEASE_INTERVALS)
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False  # Held by another finalizer
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self._acquire_lease():
+                    continue
+                count = finalize_stale_sessions()
+                if count:
+                    logger.info(f"Finalized {count} stale charging session(s)")
+            except Exception as e:
+                logger.error(f"Error in session finalizer: {e}")
+
+
+_finalizer = SessionFinalizer()
+
+
+def get_session_finalizer():
+    return _finalizer
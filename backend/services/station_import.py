@@ -0,0 +1,232 @@
+"""
+Streaming bulk station import.
+
+Rows are parsed from the request stream one at a time (NDJSON or CSV),
+validated into station documents and written in insert_many(ordered=False)
+chunks, so memory is bounded by the chunk size rather than the upload.
+Failures are reported per row by line number; the error list is capped so
+a badly formatted upload cannot grow the response without bound.
+
+CSV columns: name, address, city, lat, lng, and optionally status,
+operatingHours, amenities (";"-separated), image, timezone (IANA name), and
+ports, pricing and peakHours as JSON. NDJSON rows use the same keys as POST /api/stations,
+with coordinates as {"lat", "lng"}.
+"""
+
+import csv
+import io
+import json
+
+from pymongo.errors import BulkWriteError
+
+from models.station import Station
+from services.tariff import is_valid_timezone
+
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+STATION_STATUSES = ('available', 'busy', 'offline')
+PORT_STATUSES = ('available', 'busy', 'offline')
+
+
+class RowError(ValueError):
+    """A row that cannot be turned into a station"""
+
+
+def _text_stream(stream):
+    return io.TextIOWrapper(io.BufferedReader(stream), encoding='utf-8-sig', newline='')
+
+
+def read_ndjson(stream):
+    """Yield (line, row dict or RowError) for each non-blank NDJSON line"""
+    for line_no, line in enumerate(_text_stream(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, RowError(f'Invalid JSON: {e}')
+            continue
+        if not isinstance(row, dict):
+            yield line_no, RowError('Row must be a JSON object')
+            continue
+        yield line_no, row
+
+
+def _json_cell(value, name):
+    if value is None or not value.strip():
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        raise RowError(f'{name} must be valid JSON')
+
+
+def read_csv(stream):
+    """Yield (line, row dict or RowError) for each CSV record after the header"""
+    reader = csv.DictReader(_text_stream(stream))
+    for record in reader:
+        line_no = reader.line_num
+        try:
+            row = {
+                'name': record.get('name'),
+                'address': record.get('address'),
+                'city': record.get('city'),
+                'coordinates': {'lat': record.get('lat'), 'lng': record.get('lng')},
+                'status': record.get('status') or None,
+                'operatingHours': record.get('operatingHours') or None,
+                'amenities': [a.strip() for a in (record.get('amenities') or '').split(';') if a.strip()],
+                'image': record.get('image') or None,
+                'timezone': record.get('timezone') or None,
+                'ports': _json_cell(record.get('ports'), 'ports'),
+                'pricing': _json_cell(record.get('pricing'), 'pricing'),
+                'peakHours': _json_cell(record.get('peakHours'), 'peakHours'),
+            }
+        except RowError as e:
+            yield line_no, e
+            continue
+        yield line_no, row
+
+
+def _coordinate(value, name, bound):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{name} must be a number')
+    if not -bound <= number <= bound:
+        raise RowError(f'{name} must be between -{bound} and {bound}')
+    return number
+
+
+def _ports(ports):
+    if ports is None:
+        return []
+    if not isinstance(ports, list):
+        raise RowError('ports must be a list')
+    result = []
+    for position, port in enumerate(ports, start=1):
+        if not isinstance(port, dict) or not port.get('type'):
+            raise RowError(f'port {position} must be an object with a type')
+        status = port.get('status', 'available')
+        if status not in PORT_STATUSES:
+            raise RowError(f'port {position} has invalid status {status!r}')
+        result.append({**port, 'id': port.get('id', position), 'status': status})
+    if len({p['id'] for p in result}) != len(result):
+        raise RowError('port ids must be unique')
+    return result
+
+
+def station_from_row(row, operator_id):
+    """Validate a parsed row and build its station document"""
+    for field in ('name', 'address', 'city'):
+        if not isinstance(row.get(field), str) or not row[field].strip():
+            raise RowError(f'{field} is required')
+
+    coordinates = row.get('coordinates') or {}
+    if not isinstance(coordinates, dict):
+        raise RowError('coordinates must be an object')
+    status = row.get('status') or 'available'
+    if status not in STATION_STATUSES:
+        raise RowError(f'invalid status {status!r}')
+    pricing = row.get('pricing') or {}
+    if not isinstance(pricing, dict):
+        raise RowError('pricing must be an object')
+    station_timezone = row.get('timezone') or None
+    if station_timezone is not None and not is_valid_timezone(station_timezone):
+        raise RowError(f'unknown timezone {station_timezone!r}')
+
+    station = Station(
+        name=row['name'].strip(),
+        address=row['address'].strip(),
+        city=row['city'].strip(),
+        coordinates={
+            'lat': _coordinate(coordinates.get('lat'), 'lat', 90),
+            'lng': _coordinate(coordinates.get('lng'), 'lng', 180),
+        },
+        operator_id=operator_id,
+        status=status,
+        amenities=row.get('amenities') or [],
+        operating_hours=row.get('operatingHours') or '24/7',
+        ports=_ports(row.get('ports')),
+        pricing=pricing,
+        peak_hours=row.get('peakHours'),
+        image=row.get('image'),
+        timezone=station_timezone
+    )
+    return station.to_dict()
+
+
+class ImportReport:
+    """Running totals and the capped per-row error list"""
+
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        self.max_errors = max_errors
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def to_response_dict(self):
+        return {
+            'received': self.received,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errorsTruncated': self.failed > len(self.errors)
+        }
+
+
+def import_stations(db, rows, operator_id, on_inserted=None, chunk_size=IMPORT_CHUNK_SIZE, report=None):
+    """
+    Validate and insert stations from an iterable of (line, row) pairs.
+
+    Args:
+        db: Database instance
+        rows: Output of read_ndjson / read_csv
+        operator_id: Owner of the imported stations
+        on_inserted: Optional callback receiving each chunk's inserted documents
+        chunk_size: Documents per insert_many call
+        report: ImportReport to fill in, so a caller can see what was
+            inserted before an exception aborted the import
+
+    Returns:
+        ImportReport
+    """
+    report = report if report is not None else ImportReport()
+    chunk, lines = [], []
+
+    def flush():
+        failed = set()
+        try:
+            db.stations.insert_many(chunk, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get('writeErrors', []):
+                failed.add(err['index'])
+                report.error(lines[err['index']], err.get('errmsg', 'Write failed'))
+        inserted = [doc for i, doc in enumerate(chunk) if i not in failed]
+        report.inserted += len(inserted)
+        if on_inserted and inserted:
+            on_inserted(inserted)
+        chunk.clear()
+        lines.clear()
+
+    for line, row in rows:
+        report.received += 1
+        if isinstance(row, RowError):
+            report.error(line, str(row))
+            continue
+        try:
+            chunk.append(station_from_row(row, operator_id))
+            lines.append(line)
+        except RowError as e:
+            report.error(line, str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return report
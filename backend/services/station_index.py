@@ -0,0 +1,410 @@
+"""
+In-process spatial index of the station catalog.
+
+The catalog is small compared to request volume and changes rarely, so every
+worker keeps a copy of the station documents bucketed into a fixed lat/lng grid.
+The grid narrows a query down to candidate stations and the DistanceEngine
+computes their distances in one vectorized pass, so radius and k-nearest
+queries are answered from memory. Writes in this process refresh single
+stations; writes made by other worker processes are detected through the
+catalog version counter and pulled in by updated_at, and the whole index is
+rebuilt periodically as a safety net. Rebuilds, syncs and single-station
+refreshes are serialized by one refresh lock. A rebuild that is only due to
+age is single-flight: concurrent requests keep answering from the current
+contents. A request that needs a newer catalog version than the index holds
+waits for the refresh, so a response tagged with that version never carries
+older data. A rebuild is assembled off to the side and swapped in, so
+readers are not held up while it loads.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from services.clusters import ClusterGrid
+from services.distance import DistanceEngine, corridor_distances
+from services.geo import station_lat_lng, bounding_box, KM_PER_DEGREE
+from services.suggest import SuggestIndex, suggest_fields
+
+logger = logging.getLogger('evpulse.services')
+
+# Half of the Earth's circumference - no two points are further apart
+MAX_SEARCH_RADIUS_KM = math.pi * 6371.0
+
+# Re-read changes this far before the last sync to absorb clock skew between app servers
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class StationIndex:
+    """Grid-bucketed in-memory copy of the stations collection"""
+
+    def __init__(self, cell_size_deg=0.1, max_age_seconds=300):
+        self.cell_size_deg = cell_size_deg
+        self.max_age_seconds = max_age_seconds
+        self._rows = int(math.ceil(180 / cell_size_deg))
+        self._cols = int(math.ceil(360 / cell_size_deg))
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.RLock()  # one rebuild, sync or refresh at a time
+        self._stations = {}            # station_id -> raw station document
+        self._cells = defaultdict(set)  # (row, col) -> station ids
+        self._cell_of = {}             # station_id -> (row, col)
+        self._engine = None            # DistanceEngine over stations with coordinates
+        self._row_ids = None           # engine row -> station_id
+        self._row_of = {}              # station_id -> engine row
+        self._cluster_grids = {}       # zoom -> ClusterGrid, built on first use
+        self._suggest = None           # SuggestIndex, rebuilt on first use after text changes
+        self._built_at = None
+        self._synced_at = None         # wall-clock time of the last load from MongoDB
+        self.version = 0               # catalog version the contents reflect
+
+    @property
+    def is_ready(self):
+        """True once the index has been built"""
+        return self._built_at is not None
+
+    @property
+    def is_stale(self):
+        """True when the index is older than max_age_seconds"""
+        return self._built_at is None or time.monotonic() - self._built_at > self.max_age_seconds
+
+    def __len__(self):
+        return len(self._stations)
+
+    def _cell(self, lat, lng):
+        row = min(int((lat + 90.0) / self.cell_size_deg), self._rows - 1)
+        col = int((lng + 180.0) / self.cell_size_deg) % self._cols
+        return row, col
+
+    def _add(self, station):
+        station_id = str(station['_id'])
+        self._stations[station_id] = station
+        point = station_lat_lng(station)
+        if point is not None:
+            cell = self._cell(*point)
+            self._cells[cell].add(station_id)
+            self._cell_of[station_id] = cell
+        for grid in self._cluster_grids.values():
+            grid.add(station_id, station)
+
+    def _discard(self, station_id):
+        station = self._stations.pop(station_id, None)
+        if station is not None:
+            for grid in self._cluster_grids.values():
+                grid.remove(station_id, station)
+        cell = self._cell_of.pop(station_id, None)
+        if cell is not None:
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(station_id)
+                if not members:
+                    del self._cells[cell]
+
+    def _ensure_engine(self):
+        """(Re)build the coordinate arrays after stations were added, moved or removed"""
+        if self._engine is None:
+            row_ids = list(self._cell_of)
+            points = [station_lat_lng(self._stations[station_id]) for station_id in row_ids]
+            self._engine = DistanceEngine(
+                [p[0] for p in points],
+                [p[1] for p in points]
+            )
+            self._row_ids = np.array(row_ids, dtype=str)
+            self._row_of = {station_id: row for row, station_id in enumerate(row_ids)}
+        return self._engine
+
+    def build(self, db, version=0):
+        """
+        Load the full catalog from MongoDB and replace the index contents.
+
+        Args:
+            db: Database instance
+            version: Catalog version read before loading
+        """
+        with self._refresh_lock:
+            started = datetime.utcnow()
+            stations = list(db.stations.find({}))
+            fresh = StationIndex(self.cell_size_deg, self.max_age_seconds)
+            for station in stations:
+                fresh._add(station)
+            fresh._ensure_engine()
+            with self._lock:
+                self._stations = fresh._stations
+                self._cells = fresh._cells
+                self._cell_of = fresh._cell_of
+                self._engine = fresh._engine
+                self._row_ids = fresh._row_ids
+                self._row_of = fresh._row_of
+                self._cluster_grids = {}
+                self._suggest = None
+                self._built_at = time.monotonic()
+                self._synced_at = started
+                self.version = version
+        logger.info(f"Station index built with {len(stations)} station(s) at catalog version {version}")
+
+    def ensure_fresh(self, db, version=None):
+        """
+        Bring the index up to date.
+
+        Rebuilds when it has never been built or has expired; otherwise, when the
+        catalog version moved past ours, pulls in only the stations written since
+        the last sync. Only one caller refreshes at a time. When the index is
+        merely old, the others return straight away and read the current
+        contents; when it is empty or behind version, they wait, so on return
+        the index reflects at least version.
+        """
+        if not self._needs_refresh(version):
+            return
+        behind = not self.is_ready or (version is not None and version > self.version)
+        if not self._refresh_lock.acquire(blocking=behind):
+            return
+        try:
+            # Another caller may have refreshed while we waited for the lock
+            if self.is_stale:
+                self.build(db, version or 0)
+            elif version is not None and version > self.version:
+                self.sync(db, version)
+        finally:
+            self._refresh_lock.release()
+
+    def _needs_refresh(self, version):
+        return self.is_stale or (version is not None and version > self.version)
+
+    def sync(self, db, version):
+        """Reload stations whose updated_at is newer than the last sync"""
+        with self._refresh_lock:
+            started = datetime.utcnow()
+            changed = list(db.stations.find({'updated_at': {'$gte': self._synced_at - SYNC_OVERLAP}}))
+            with self._lock:
+                for station in changed:
+                    self._replace(str(station['_id']), station)
+                self._synced_at = started
+                self.version = max(self.version, version)
+
+    def _replace(self, station_id, station):
+        """Swap in a fresh copy of a station (None removes it)"""
+        previous = self._stations.get(station_id)
+        self._discard(station_id)
+        if station:
+            self._add(station)
+        # Port and status writes leave coordinates alone and keep the arrays valid
+        old_point = station_lat_lng(previous) if previous else None
+        new_point = station_lat_lng(station) if station else None
+        if old_point != new_point:
+            self._engine = None
+        # Name, city, address or location edits (and adds and removes) invalidate autocomplete
+        old_text = suggest_fields(previous) if previous else None
+        new_text = suggest_fields(station) if station else None
+        if old_text != new_text:
+            self._suggest = None
+        elif station is not None and self._suggest is not None:
+            self._suggest.set_rating(station_id, station.get('rating'))
+
+    def refresh(self, db, station_id, version=None):
+        """
+        Reload a single station after a write (removes it if it no longer exists).
+
+        Args:
+            db: Database instance
+            station_id: Station that was written
+            version: Catalog version produced by the write; adopted only if it
+                directly follows ours, otherwise the next ensure_fresh() syncs
+        """
+        with self._refresh_lock:
+            station = db.stations.find_one({'_id': ObjectId(station_id)})
+            with self._lock:
+                self._replace(str(station_id), station)
+                if version is not None and version == self.version + 1:
+                    self.version = version
+
+    def get(self, station_id):
+        """Return the raw station document, or None"""
+        return self._stations.get(str(station_id))
+
+    def _candidate_ids(self, lat, lng, radius_km):
+        """Station ids in the grid cells overlapping the circle's bounding box"""
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        row_lo = self._cell(min_lat, 0)[0]
+        row_hi = self._cell(max_lat, 0)[0]
+
+        if min_lng is None:
+            for (row, _), members in self._cells.items():
+                if row_lo <= row <= row_hi:
+                    yield from members
+            return
+
+        col_lo = int(math.floor((min_lng + 180.0) / self.cell_size_deg))
+        col_hi = int(math.floor((max_lng + 180.0) / self.cell_size_deg))
+        cols = {col % self._cols for col in range(col_lo, col_hi + 1)}
+        for row in range(row_lo, row_hi + 1):
+            for col in cols:
+                members = self._cells.get((row, col))
+                if members:
+                    yield from members
+
+    def within_radius(self, lat, lng, radius_km, predicate=None, limit=None, after=None):
+        """
+        Return [(distance_km, station)] for stations within radius_km, nearest first.
+
+        Args:
+            lat, lng: Query point
+            radius_km: Search radius
+            predicate: Optional callable(station) -> bool applied before distance math
+            limit: Return only the nearest `limit` matches (top-k selection, no full sort)
+            after: Optional (distance_km, station_id) keyset position; only later matches are returned
+        """
+        with self._lock:
+            engine = self._ensure_engine()
+            rows = [
+                self._row_of[station_id]
+                for station_id in self._candidate_ids(lat, lng, radius_km)
+                if not predicate or predicate(self._stations[station_id])
+            ]
+            if not rows:
+                return []
+            rows = np.fromiter(rows, dtype=np.intp, count=len(rows))
+            distances = engine.distances(lat, lng, rows)
+            keep = distances <= radius_km
+            ids = self._row_ids[rows]
+            if after is not None:
+                after_distance, after_id = after
+                keep &= (distances > after_distance) | ((distances == after_distance) & (ids > after_id))
+            distances, ids = distances[keep], ids[keep]
+
+            if limit is not None and len(distances) > limit:
+                # Select the k smallest without sorting everything; keep boundary ties
+                # so the id tie-break below stays exact
+                kth = np.partition(distances, limit - 1)[limit - 1]
+                head = distances <= kth
+                distances, ids = distances[head], ids[head]
+
+            # Nearest first, station id breaks ties so the order is deterministic
+            order = np.lexsort((ids, distances))
+            if limit is not None:
+                order = order[:limit]
+            return [(float(distances[i]), self._stations[str(ids[i])]) for i in order]
+
+    def nearest(self, lat, lng, k, predicate=None, max_distance_km=None, after=None):
+        """
+        Return the k nearest stations as [(distance_km, station)].
+
+        The search radius starts one grid cell beyond the keyset position and
+        doubles until k matches are found; every station inside the final radius
+        is exact, so the k nearest overall are among them.
+        """
+        limit = max_distance_km if max_distance_km else MAX_SEARCH_RADIUS_KM
+        step = self.cell_size_deg * KM_PER_DEGREE
+        radius = min((after[0] if after else 0) + step, limit)
+        while True:
+            matches = self.within_radius(lat, lng, radius, predicate, limit=k, after=after)
+            if len(matches) >= k or radius >= limit:
+                return matches
+            radius = min(radius * 2, limit)
+
+    def along_route(self, route, width_km, predicate=None):
+        """
+        Return stations within width_km of a polyline, ordered by position along it.
+
+        Args:
+            route: [(lat, lng), ...] polyline vertices
+            width_km: Maximum distance from the route
+            predicate: Optional callable(station) -> bool
+
+        Returns:
+            ([(offset_km, distance_km, station)], route_length_km)
+        """
+        route_lats = np.array([p[0] for p in route], dtype=np.float64)
+        route_lngs = np.array([p[1] for p in route], dtype=np.float64)
+
+        # Bounding-box prefilter: the route's extent grown by the corridor width
+        pad_lat = width_km / KM_PER_DEGREE
+        max_abs_lat = min(np.abs(route_lats).max() + pad_lat, 89.9)
+        pad_lng = pad_lat / np.cos(np.radians(max_abs_lat))
+        min_lng, max_lng = route_lngs.min(), route_lngs.max()
+        check_lng = max_lng - min_lng + 2 * pad_lng < 180
+
+        with self._lock:
+            engine = self._ensure_engine()
+            lats = np.degrees(engine.lat_rad)
+            lngs = np.degrees(engine.lng_rad)
+            mask = (lats >= route_lats.min() - pad_lat) & (lats <= route_lats.max() + pad_lat)
+            if check_lng:
+                mask &= (lngs >= min_lng - pad_lng) & (lngs <= max_lng + pad_lng)
+            rows = np.flatnonzero(mask)
+            if predicate:
+                rows = np.array(
+                    [row for row in rows if predicate(self._stations[str(self._row_ids[row])])],
+                    dtype=np.intp
+                )
+
+            distances, offsets, route_length = corridor_distances(
+                route_lats, route_lngs, lats[rows], lngs[rows]
+            )
+            inside = distances <= width_km
+            rows, distances, offsets = rows[inside], distances[inside], offsets[inside]
+            order = np.lexsort((distances, offsets))
+            return [
+                (float(offsets[i]), float(distances[i]), self._stations[str(self._row_ids[rows[i]])])
+                for i in order
+            ], route_length
+
+    def clusters(self, min_lat, min_lng, max_lat, max_lng, zoom):
+        """Return cluster markers for a viewport at the given zoom level"""
+        with self._lock:
+            grid = self._cluster_grids.get(zoom)
+            if grid is None:
+                grid = ClusterGrid(zoom)
+                for station_id, station in self._stations.items():
+                    grid.add(station_id, station)
+                self._cluster_grids[zoom] = grid
+            return grid.query(min_lat, min_lng, max_lat, max_lng)
+
+    def suggest(self, query, lat=None, lng=None, limit=10, predicate=None):
+        """
+        Autocomplete stations by name, city and address prefixes.
+
+        Ranked by relevance, then distance from (lat, lng) when given, then rating.
+
+        Returns:
+            [(score, distance_km or None, station)]
+        """
+        with self._lock:
+            if self._suggest is None:
+                self._suggest = SuggestIndex(self._stations)
+            results = []
+            # Ranked lazily, so the predicate only runs until limit matches are found
+            for station_id, score, distance in self._suggest.ranked(query, lat, lng):
+                station = self._stations[station_id]
+                if predicate and not predicate(station):
+                    continue
+                results.append((score, distance, station))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def all(self, predicate=None):
+        """Return every station document matching predicate"""
+        with self._lock:
+            return [s for s in self._stations.values() if not predicate or predicate(s)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_station_index():
+    """Get the process-wide station index"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = StationIndex(
+                    max_age_seconds=int(os.getenv('STATION_INDEX_MAX_AGE', 300))
+                )
+    return _index
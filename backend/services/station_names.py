@@ -0,0 +1,118 @@
+"""
+Station-name join for list endpoints.
+
+Sessions, bookings and reviews store only a station id but their list views
+show the station name. station_names() resolves a whole page of ids at once:
+from the in-process station index when it is loaded, then from a bounded LRU
+cache, and finally with a single $in query for whatever is left, so a list
+costs a fixed number of queries however many rows it has.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+
+from app import mongo
+from services.station_index import get_station_index
+
+UNKNOWN_STATION_NAME = 'Unknown Station'
+NAME_CACHE_SIZE = 10000
+# Bounds staleness of names renamed by another worker process
+NAME_CACHE_TTL_SECONDS = 300
+
+
+class StationNameCache:
+    """Thread-safe LRU of station id -> name with a per-entry TTL"""
+
+    def __init__(self, max_size=NAME_CACHE_SIZE, ttl_seconds=NAME_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # station_id -> (expires_at, name)
+
+    def get_many(self, station_ids):
+        """Return ({id: name} for cached ids, [ids not cached])"""
+        now = time.monotonic()
+        hits, misses = {}, []
+        with self._lock:
+            for station_id in station_ids:
+                entry = self._entries.get(station_id)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(station_id)
+                    hits[station_id] = entry[1]
+                else:
+                    misses.append(station_id)
+        return hits, misses
+
+    def put_many(self, names):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for station_id, name in names.items():
+                self._entries[station_id] = (expires_at, name)
+                self._entries.move_to_end(station_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, station_id):
+        with self._lock:
+            self._entries.pop(str(station_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = StationNameCache()
+
+
+def invalidate_station_name(station_id):
+    _cache.invalidate(station_id)
+
+
+def clear_station_names():
+    _cache.clear()
+
+
+def station_names(station_ids):
+    """
+    Resolve station ids to names with at most one query.
+
+    Returns:
+        {station_id: name} for every requested id; unknown ids map to
+        UNKNOWN_STATION_NAME
+    """
+    requested = [str(i) for i in station_ids if i]
+    wanted = list(dict.fromkeys(requested))
+    names = {}
+
+    index = get_station_index()
+    if index.is_ready:
+        for station_id in wanted:
+            station = index.get(station_id)
+            if station is not None:
+                names[station_id] = station.get('name')
+        wanted = [i for i in wanted if i not in names]
+
+    hits, misses = _cache.get_many(wanted)
+    names.update(hits)
+
+    object_ids = [ObjectId(i) for i in misses if ObjectId.is_valid(i)]
+    if object_ids:
+        fetched = {
+            str(doc['_id']): doc.get('name')
+            for doc in mongo.db.stations.find({'_id': {'$in': object_ids}}, {'name': 1})
+        }
+        _cache.put_many(fetched)
+        names.update(fetched)
+
+    return {i: names.get(i) or UNKNOWN_STATION_NAME for i in requested}
+
+
+def attach_station_names(items, station_ids, name_key='stationName'):
+    """Set name_key on each response dict from the aligned station id in one batched lookup"""
+    names = station_names(station_ids)
+    for item, station_id in zip(items, station_ids):
+        item[name_key] = names.get(str(station_id), UNKNOWN_STATION_NAME)
+    return items
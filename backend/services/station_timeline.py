@@ -0,0 +1,140 @@
+"""
+Time-bucketed session timeline for one station.
+
+station_timeline() answers with a single aggregation over the
+(station_id, start_time) index. The window [start, end) is cut into fixed
+buckets aligned to the bucket size; a $facet computes, in the same pass,
+the sessions started in each bucket with their energy and revenue, and the
+time sessions spent plugged in during each bucket, which gives the average
+number of ports occupied (sessions spanning several buckets are split
+across them) and, given the station's port count, its utilization. Buckets
+without any activity are filled in with zeros.
+"""
+
+from datetime import datetime, timedelta
+
+from app import mongo
+
+BUCKET_SIZES = {
+    '15min': timedelta(minutes=15),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+# Window used when the caller gives no start
+DEFAULT_SPANS = {
+    '15min': timedelta(days=1),
+    'hour': timedelta(days=7),
+    'day': timedelta(days=30),
+}
+MAX_BUCKETS = 2000
+# Sessions are looked up by start time; one that started this long before the
+# window and is still running is not counted in its occupancy
+MAX_SESSION_SPAN = timedelta(days=1)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidTimelineError(ValueError):
+    """The bucket or time range of a timeline request is invalid"""
+
+
+def _floor(moment, size):
+    return _EPOCH + (moment - _EPOCH) // size * size
+
+
+def timeline_window(bucket, start=None, end=None, now=None):
+    """
+    Validate a timeline request and align it to whole buckets.
+
+    Returns:
+        (bucket size, aligned start, aligned end)
+
+    Raises:
+        InvalidTimelineError: if the bucket is unknown or the range is empty or too long
+    """
+    if bucket not in BUCKET_SIZES:
+        raise InvalidTimelineError(f"bucket must be one of: {', '.join(BUCKET_SIZES)}")
+    size = BUCKET_SIZES[bucket]
+    end = end or now or datetime.utcnow()
+    start = start or end - DEFAULT_SPANS[bucket]
+    start = _floor(start, size)
+    end = _floor(end, size) + (size if _floor(end, size) < end else timedelta(0))
+    if start >= end:
+        raise InvalidTimelineError('from must be before to')
+    if (end - start) / size > MAX_BUCKETS:
+        raise InvalidTimelineError(f'At most {MAX_BUCKETS} buckets per request')
+    return size, start, end
+
+
+def _bucket_of(date_expr, start, size_ms):
+    return {'$floor': {'$divide': [{'$subtract': [date_expr, start]}, size_ms]}}
+
+
+def station_timeline(station_id, bucket='hour', start=None, end=None, ports=0, now=None):
+    """
+    Session counts, energy, revenue and occupancy per bucket for a station.
+
+    Returns:
+        (aligned start, aligned end, list of bucket dicts in time order)
+    """
+    now = now or datetime.utcnow()
+    size, start, end = timeline_window(bucket, start, end, now)
+    size_ms = size.total_seconds() * 1000
+
+    bucket_start = {'$add': [start, {'$multiply': ['$_bucket', size_ms]}]}
+    pipeline = [
+        {'$match': {
+            'station_id': station_id,
+            'start_time': {'$gte': start - MAX_SESSION_SPAN, '$lt': end},
+            'status': {'$ne': 'cancelled'}
+        }},
+        {'$project': {'start_time': 1, 'end_time': 1, 'energy_delivered': 1, 'cost': 1}},
+        {'$facet': {
+            'started': [
+                {'$match': {'start_time': {'$gte': start}}},
+                {'$group': {
+                    '_id': _bucket_of('$start_time', start, size_ms),
+                    'sessions': {'$sum': 1},
+                    'energy': {'$sum': {'$ifNull': ['$energy_delivered', 0]}},
+                    'revenue': {'$sum': {'$ifNull': ['$cost', 0]}}
+                }}
+            ],
+            'occupied': [
+                # Clip each session to the window; active ones run until now
+                {'$set': {
+                    '_from': {'$max': ['$start_time', start]},
+                    '_to': {'$min': [{'$ifNull': ['$end_time', now]}, end]}
+                }},
+                {'$match': {'$expr': {'$lt': ['$_from', '$_to']}}},
+                {'$set': {'_bucket': {'$range': [
+                    {'$toInt': _bucket_of('$_from', start, size_ms)},
+                    {'$add': [{'$toInt': _bucket_of({'$subtract': ['$_to', 1]}, start, size_ms)}, 1]}
+                ]}}},
+                {'$unwind': '$_bucket'},
+                {'$group': {
+                    '_id': '$_bucket',
+                    'busy_ms': {'$sum': {'$subtract': [
+                        {'$min': ['$_to', {'$add': [bucket_start, size_ms]}]},
+                        {'$max': ['$_from', bucket_start]}
+                    ]}}
+                }}
+            ]
+        }}
+    ]
+    result = next(mongo.db.sessions.aggregate(pipeline), {'started': [], 'occupied': []})
+
+    started = {int(row['_id']): row for row in result['started']}
+    occupied = {int(row['_id']): row['busy_ms'] for row in result['occupied']}
+    buckets = []
+    for i in range(int((end - start) / size)):
+        row = started.get(i, {})
+        buckets.append({
+            'start': (start + i * size).isoformat(),
+            'sessions': row.get('sessions', 0),
+            'energy': round(row.get('energy', 0), 2),
+            'revenue': round(row.get('revenue', 0), 2),
+            # Average number of ports in use over the bucket
+            'occupancy': round(occupied.get(i, 0) / size_ms, 3),
+            'utilization': round(occupied.get(i, 0) / size_ms / ports, 3) if ports else None
+        })
+    return start, end, buckets
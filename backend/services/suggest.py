@@ -0,0 +1,138 @@
+"""
+Prefix index for station autocomplete.
+
+Every word of a station's name, city and address is normalized (lowercase,
+accents stripped) and stored in one sorted key list, so the stations whose
+words start with a typed prefix form a contiguous slice found by binary
+search. Station ids, field weights, ratings and coordinates are held in NumPy
+arrays aligned with that list, so scoring a slice, intersecting the slices of
+a multi-word query and ranking the result are array operations even when a
+short prefix matches most of the catalog.
+"""
+
+import math
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from services.distance import DistanceEngine
+from services.geo import station_lat_lng
+
+# Score per matched word by the field it matched in
+FIELD_WEIGHTS = {'name': 3.0, 'city': 2.0, 'address': 1.0}
+# A query word that equals a whole indexed word beats a partial prefix
+EXACT_WORD_BONUS = 0.5
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize_text(text):
+    """Lowercase, strip accents and split into alphanumeric words"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    ascii_text = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _WORD_RE.findall(ascii_text.lower())
+
+
+def suggest_fields(station):
+    """Fields baked into the index; a change to any of them needs a rebuild"""
+    return tuple(station.get(field) for field in FIELD_WEIGHTS) + (station_lat_lng(station),)
+
+
+class SuggestIndex:
+    """Sorted word list over station text fields with array-backed scoring"""
+
+    def __init__(self, stations):
+        self.station_ids = list(stations)
+        self._code_of = {station_id: code for code, station_id in enumerate(self.station_ids)}
+
+        entries = []
+        lats, lngs, ratings = [], [], []
+        for code, station in enumerate(stations.values()):
+            best = {}
+            for field, weight in FIELD_WEIGHTS.items():
+                value = station.get(field)
+                if not isinstance(value, str):
+                    continue
+                for word in normalize_text(value):
+                    # One entry per word, at the weight of its best field
+                    if best.get(word, 0) < weight:
+                        best[word] = weight
+            entries.extend((word, code, weight) for word, weight in best.items())
+
+            point = station_lat_lng(station) or (math.nan, math.nan)
+            lats.append(point[0])
+            lngs.append(point[1])
+            ratings.append(station.get('rating') or 0)
+
+        entries.sort()
+        self._keys = [e[0] for e in entries]
+        self._codes = np.fromiter((e[1] for e in entries), dtype=np.int64, count=len(entries))
+        self._weights = np.fromiter((e[2] for e in entries), dtype=np.float64, count=len(entries))
+        self._ratings = np.asarray(ratings, dtype=np.float64)
+        self._engine = DistanceEngine(lats, lngs)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def set_rating(self, station_id, rating):
+        """Keep the rating tie-breaker current without a rebuild"""
+        code = self._code_of.get(station_id)
+        if code is not None:
+            self._ratings[code] = rating or 0
+
+    def _prefix_scores(self, prefix):
+        """(sorted unique station codes, best score of each) for words starting with prefix"""
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + '\uffff', lo)
+        exact = bisect_right(self._keys, prefix, lo, hi)
+
+        codes = self._codes[lo:hi]
+        scores = self._weights[lo:hi].copy()
+        scores[:exact - lo] += EXACT_WORD_BONUS
+
+        order = np.lexsort((-scores, codes))
+        codes = codes[order]
+        scores = scores[order]
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = codes[1:] != codes[:-1]
+        return codes[first], scores[first]
+
+    def match(self, query):
+        """
+        Stations matching every word of the query as a prefix.
+
+        Returns:
+            (station codes, relevance scores) as aligned arrays
+        """
+        words = sorted(set(normalize_text(query)), key=len, reverse=True)
+        if not words:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        # Longest words first: their slices are the narrowest
+        codes, scores = self._prefix_scores(words[0])
+        for word in words[1:]:
+            if not len(codes):
+                break
+            other_codes, other_scores = self._prefix_scores(word)
+            codes, i, j = np.intersect1d(codes, other_codes, assume_unique=True, return_indices=True)
+            scores = scores[i] + other_scores[j]
+        return codes, scores
+
+    def ranked(self, query, lat=None, lng=None):
+        """
+        Yield (station_id, score, distance_km or None) best first.
+
+        Order: relevance, then distance from (lat, lng) when given, then rating.
+        """
+        codes, scores = self.match(query)
+        if not len(codes):
+            return
+        if lat is not None and lng is not None:
+            distances = np.nan_to_num(self._engine.distances(lat, lng, codes), nan=np.inf)
+        else:
+            distances = np.zeros(len(codes))
+        order = np.lexsort((codes, -self._ratings[codes], distances, -scores))
+        for i in order:
+            distance = float(distances[i]) if lat is not None and np.isfinite(distances[i]) else None
+            yield self.station_ids[codes[i]], float(scores[i]), distance
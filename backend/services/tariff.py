@@ -0,0 +1,284 @@
+"""
+Station tariffs.
+
+A station's ``pricing`` ({normal: {base, peak}, fast: {base, peak}}) and
+``peak_hours`` ({start, end} as "HH:MM", possibly wrapping past midnight) are
+compiled into one table per charging kind: the minutes of the day at which
+the rate changes and the rate from each of those minutes on. Compiled
+tariffs are cached per station version (its ``updated_at``), so pricing a
+session or quoting a list of stations does no parsing per request, and a
+session is priced by walking the table once from its start to its end,
+splitting its energy across every peak and off-peak stretch it overlaps.
+
+Peak hours are wall-clock times at the station. Every method takes the
+naive UTC datetimes stored on sessions and converts them to the station's
+``timezone`` (an IANA name; STATION_TIMEZONE when the station has none)
+before looking up a rate, so sessions, quotes and bookings all see the same
+peak window. Booking slots, which are station-local, go through to_utc().
+"""
+
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from bson import ObjectId
+
+from app import mongo
+from services.catalog import get_catalog_version
+from services.station_index import get_station_index
+
+# Per-kWh rates for stations that do not price a charging kind themselves
+DEFAULT_RATES = {'normal': 0.25, 'fast': 0.35}
+MINUTES_PER_DAY = 24 * 60
+TARIFF_CACHE_SIZE = 10000
+TARIFF_PROJECTION = {'pricing': 1, 'peak_hours': 1, 'timezone': 1, 'updated_at': 1}
+# Energy assumed for quotes that do not give one (~30 kWh per hour of charging)
+ESTIMATED_KWH_PER_HOUR = 30
+# Timezone of stations that do not store one
+DEFAULT_TIMEZONE = os.getenv('STATION_TIMEZONE', 'UTC')
+
+
+def charging_kind(charging_type):
+    """Map a port or session charging type ('Fast DC', 'Normal AC', ...) to a pricing key"""
+    return 'fast' if 'fast' in (charging_type or '').lower() else 'normal'
+
+
+def is_valid_timezone(name):
+    """Whether name is a known IANA timezone"""
+    try:
+        ZoneInfo(str(name))
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def _zone(name):
+    return ZoneInfo(name) if name and is_valid_timezone(name) else ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def _minute_of_day(value):
+    try:
+        hours, minutes = str(value).split(':')
+        minute = int(hours) * 60 + int(minutes)
+    except (TypeError, ValueError):
+        return None
+    return minute if 0 <= minute <= MINUTES_PER_DAY else None
+
+
+def _rate(value, default):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+class Tariff:
+    """Compiled per-kind rate tables for one station"""
+
+    def __init__(self, pricing=None, peak_hours=None, timezone_name=None):
+        pricing = pricing if isinstance(pricing, dict) else {}
+        peak_hours = peak_hours if isinstance(peak_hours, dict) else {}
+        peak_start = _minute_of_day(peak_hours.get('start'))
+        peak_end = _minute_of_day(peak_hours.get('end'))
+        if peak_start is None or peak_end is None or peak_start == peak_end:
+            peak_start = peak_end = None
+        self.zone = _zone(timezone_name)
+        self._peak = (peak_start, peak_end)
+
+        self._tables = {}
+        for kind, default in DEFAULT_RATES.items():
+            prices = pricing.get(kind) if isinstance(pricing.get(kind), dict) else {}
+            base = _rate(prices.get('base'), default)
+            peak = _rate(prices.get('peak'), base)
+            self._tables[kind] = self._compile(base, peak, peak_start, peak_end)
+
+    @staticmethod
+    def _compile(base, peak, peak_start, peak_end):
+        """([minute the rate starts], [rate]) covering the day from minute 0"""
+        if peak_start is None or base == peak:
+            return [0], [base]
+        if peak_start < peak_end:
+            changes = [(0, base), (peak_start, peak), (peak_end, base)]
+        else:
+            # Window wraps past midnight
+            changes = [(0, peak), (peak_end, base), (peak_start, peak)]
+        starts, rates = [], []
+        for minute, rate in changes:
+            if minute >= MINUTES_PER_DAY:
+                continue
+            if starts and starts[-1] == minute:
+                rates[-1] = rate
+            elif not rates or rates[-1] != rate:
+                starts.append(minute)
+                rates.append(rate)
+        return starts, rates
+
+    def to_local(self, when):
+        """Station wall-clock time (naive) of a naive UTC datetime"""
+        return when.replace(tzinfo=timezone.utc).astimezone(self.zone).replace(tzinfo=None)
+
+    def to_utc(self, local):
+        """Naive UTC datetime of a naive station wall-clock time"""
+        return local.replace(tzinfo=self.zone).astimezone(timezone.utc).replace(tzinfo=None)
+
+    @staticmethod
+    def _minute(local):
+        return local.hour * 60 + local.minute + local.second / 60
+
+    def rate_at(self, kind, when):
+        """Per-kWh rate for a charging kind at a (UTC) moment"""
+        starts, rates = self._tables[kind]
+        return rates[bisect_right(starts, self._minute(self.to_local(when))) - 1]
+
+    def is_peak(self, when):
+        """Whether a (UTC) moment falls inside the station's peak window"""
+        peak_start, peak_end = self._peak
+        if peak_start is None:
+            return False
+        minute = self._minute(self.to_local(when))
+        if peak_start < peak_end:
+            return peak_start <= minute < peak_end
+        return minute >= peak_start or minute < peak_end
+
+    def price(self, kind, start, end, energy_kwh):
+        """Cost of energy delivered at an even rate between start and end (UTC)"""
+        return round((energy_kwh or 0) * self.average_rate(kind, start, end), 2)
+
+    def average_rate(self, kind, start, end):
+        """Time-weighted per-kWh rate between start and end (UTC)"""
+        if end is None or end <= start:
+            return self.rate_at(kind, start)
+        weighted = sum(rate * (to - since).total_seconds() for since, to, rate in self._stretches(kind, start, end))
+        return weighted / (end - start).total_seconds()
+
+    def cost_expression(self, kind, end, since):
+        """
+        Aggregation expression for price() of a session document from its
+        $start_time to end with its $energy_delivered, valid for sessions
+        that started at or after since.
+
+        The stretches between since and end are walked here, newest first,
+        accumulating the rate-seconds after each one; a $switch picks the
+        stretch holding $start_time, so the pipeline prices the session
+        exactly as average_rate() would without its start time being read
+        beforehand.
+        """
+        seconds = {'$divide': [{'$subtract': [end, '$start_time']}, 1000]}
+        branches = []
+        after = 0.0
+        for stretch_start, stretch_end, rate in reversed(list(self._stretches(kind, since, end))):
+            branches.append({
+                'case': {'$gte': ['$start_time', stretch_start]},
+                'then': {'$add': [after, {'$multiply': [
+                    rate, {'$divide': [{'$subtract': [stretch_end, '$start_time']}, 1000]}
+                ]}]}
+            })
+            after += rate * (stretch_end - stretch_start).total_seconds()
+        fallback = self.rate_at(kind, end)
+        average = fallback
+        if branches:
+            average = {'$cond': [
+                {'$gt': [seconds, 0]},
+                {'$divide': [{'$switch': {'branches': branches, 'default': after}}, seconds]},
+                fallback
+            ]}
+        return {'$round': [{'$multiply': [{'$ifNull': ['$energy_delivered', 0]}, average]}, 2]}
+
+    def _stretches(self, kind, start, end):
+        """
+        (from, to, rate) for each stretch of constant rate between start and
+        end (UTC), walking the rate table once from the stretch containing
+        start. Stretch boundaries are station wall-clock minutes, converted
+        back to UTC so a daylight-saving change shortens or lengthens the
+        stretch.
+        """
+        starts, rates = self._tables[kind]
+        local = self.to_local(start)
+        day = local.date()
+        i = bisect_right(starts, self._minute(local)) - 1
+        moment = start
+        while moment < end:
+            next_minute = starts[i + 1] if i + 1 < len(starts) else MINUTES_PER_DAY
+            boundary = self.to_utc(datetime.combine(day, time()) + timedelta(minutes=next_minute))
+            stretch_end = min(max(boundary, moment), end)
+            if stretch_end > moment:
+                yield moment, stretch_end, rates[i]
+            moment = stretch_end
+            i += 1
+            if i == len(starts):
+                i = 0
+                day += timedelta(days=1)
+
+
+class TariffCache:
+    """Thread-safe LRU of station id -> (station version, Tariff)"""
+
+    def __init__(self, max_size=TARIFF_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def tariff_for(self, station):
+        """Compiled tariff for a station document, reusing the cached one while its version is unchanged"""
+        station_id = str(station['_id'])
+        version = station.get('updated_at')
+        with self._lock:
+            entry = self._entries.get(station_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(station_id)
+                return entry[1]
+        tariff = Tariff(station.get('pricing'), station.get('peak_hours'), station.get('timezone'))
+        with self._lock:
+            self._entries[station_id] = (version, tariff)
+            self._entries.move_to_end(station_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return tariff
+
+
+_cache = TariffCache()
+
+
+def tariff_for(station):
+    return _cache.tariff_for(station)
+
+
+def load_tariffs(station_ids):
+    """
+    Tariffs for many stations: from the station index when it is loaded,
+    otherwise with one $in query.
+
+    Returns:
+        {station_id: Tariff} for the stations that exist
+    """
+    station_ids = [str(i) for i in station_ids]
+    index = get_station_index()
+    if index.is_ready:
+        index.ensure_fresh(mongo.db, get_catalog_version()['version'])
+        stations = [index.get(i) for i in station_ids]
+    else:
+        object_ids = [ObjectId(i) for i in station_ids if ObjectId.is_valid(i)]
+        stations = mongo.db.stations.find({'_id': {'$in': object_ids}}, TARIFF_PROJECTION)
+    return {str(station['_id']): tariff_for(station) for station in stations if station}
+
+
+def price_session(tariff, session_data):
+    """Cost of a completed session under a station's tariff"""
+    return tariff.price(
+        charging_kind(session_data.get('charging_type')),
+        session_data['start_time'],
+        session_data.get('end_time'),
+        session_data.get('energy_delivered')
+    )
+
+
+def quote(tariff, charging_type, start, duration_minutes, energy_kwh=None):
+    """Estimated cost and starting rate of a planned charge starting at start (UTC)"""
+    kind = charging_kind(charging_type)
+    if energy_kwh is None:
+        energy_kwh = ESTIMATED_KWH_PER_HOUR * duration_minutes / 60
+    return {
+        'estimatedCost': tariff.price(kind, start, start + timedelta(minutes=duration_minutes), energy_kwh),
+        'rate': tariff.rate_at(kind, start),
+        'isPeak': tariff.is_peak(start)
+    }
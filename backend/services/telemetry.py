@@ -0,0 +1,248 @@
+"""
+Meter-value telemetry for active charging sessions.
+
+Chargers (or the app on their behalf) post batches of meter readings:
+cumulative energy in kWh, instantaneous power and battery state of charge.
+Readings are buffered in process and written by a background flusher, so
+the cost of ingestion is one insert_many into the ``session_telemetry``
+time-series collection and one bulk_write of session updates per flush,
+however many samples arrived in between. For the session documents only the
+newest reading of each session is kept, so a session sending a reading per
+second still gets one update per flush interval.
+
+Buffered readings live in memory for at most FLUSH_INTERVAL_SECONDS; a crash
+loses that window, which the next reading of a live session makes good.
+"""
+
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app import mongo
+from services.session_events import publish_reading
+
+logger = logging.getLogger('evpulse.telemetry')
+
+FLUSH_INTERVAL_SECONDS = 1.0
+# Flush early once this many readings are waiting
+MAX_PENDING_READINGS = 5000
+MAX_READINGS_PER_REQUEST = 500
+# Energy assumed per minute for sessions that never reported telemetry
+ESTIMATED_KWH_PER_MINUTE = 0.8
+
+
+class InvalidTelemetryError(ValueError):
+    """A reading in the request body could not be parsed"""
+
+
+def _number(reading, key, index, minimum=None, maximum=None, required=False):
+    value = reading.get(key)
+    if value is None:
+        if required:
+            raise InvalidTelemetryError(f'readings[{index}].{key} is required')
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidTelemetryError(f'readings[{index}].{key} must be a number')
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise InvalidTelemetryError(f'readings[{index}].{key} is out of range')
+    return float(value)
+
+
+def parse_readings(body):
+    """
+    Validate a telemetry request body.
+
+    Accepts ``{"readings": [...]}`` or a single reading object. Each reading
+    has ``energyKwh`` (cumulative, required), ``powerKw``, ``soc`` (0-100) and
+    ``timestamp`` (ISO 8601, defaults to now).
+
+    Returns:
+        List of {'ts', 'energy_kwh', 'power_kw', 'soc'} dicts
+
+    Raises:
+        InvalidTelemetryError: if the body or any reading is malformed
+    """
+    if not isinstance(body, dict):
+        raise InvalidTelemetryError('Request body must be a JSON object')
+    readings = body.get('readings', [body])
+    if not isinstance(readings, list) or not readings:
+        raise InvalidTelemetryError('readings must be a non-empty list')
+    if len(readings) > MAX_READINGS_PER_REQUEST:
+        raise InvalidTelemetryError(f'At most {MAX_READINGS_PER_REQUEST} readings per request')
+
+    now = datetime.utcnow()
+    parsed = []
+    for index, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            raise InvalidTelemetryError(f'readings[{index}] must be an object')
+        ts = now
+        if reading.get('timestamp') is not None:
+            try:
+                ts = datetime.fromisoformat(str(reading['timestamp']).replace('Z', '+00:00'))
+            except ValueError:
+                raise InvalidTelemetryError(f'readings[{index}].timestamp is not ISO 8601')
+            if ts.tzinfo is not None:
+                ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        parsed.append({
+            'ts': ts,
+            'energy_kwh': _number(reading, 'energyKwh', index, minimum=0, required=True),
+            'power_kw': _number(reading, 'powerKw', index, minimum=0),
+            'soc': _number(reading, 'soc', index, minimum=0, maximum=100),
+        })
+    return parsed
+
+
+def _newer(reading, current):
+    return current is None or reading['ts'] >= current['ts']
+
+
+class TelemetryBuffer:
+    """Pending readings plus the newest reading per session, drained by a flusher thread"""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL_SECONDS, max_pending=MAX_PENDING_READINGS):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._readings = []   # time-series documents
+        self._latest = {}     # session_id -> newest reading not yet written to the session
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, session_id, station_id, readings):
+        """Queue readings for one session; they are written on the next flush"""
+        meta = {'session_id': session_id, 'station_id': station_id}
+        docs = [
+            {'ts': r['ts'], 'meta': meta, **{k: v for k, v in r.items() if k != 'ts' and v is not None}}
+            for r in readings
+        ]
+        newest = max(readings, key=lambda r: r['ts'])
+        with self._lock:
+            self._readings.extend(docs)
+            if _newer(newest, self._latest.get(session_id)):
+                self._latest[session_id] = newest
+            full = len(self._readings) >= self.max_pending
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def pending(self, session_id):
+        """Newest reading of a session not yet written to its document, or None"""
+        with self._lock:
+            return self._latest.get(session_id)
+
+    def discard_session(self, session_id):
+        """Drop the pending session update (readings are still written)"""
+        with self._lock:
+            return self._latest.pop(session_id, None)
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of readings written."""
+        with self._flush_lock:
+            with self._lock:
+                readings, self._readings = self._readings, []
+                latest, self._latest = self._latest, {}
+            if not readings and not latest:
+                return 0
+
+            db = mongo.db
+            try:
+                if readings:
+                    db.session_telemetry.insert_many(readings, ordered=False)
+                if latest:
+                    db.sessions.bulk_write(
+                        [_session_update(session_id, r) for session_id, r in latest.items()],
+                        ordered=False
+                    )
+            except Exception as e:
+                logger.error(f"Telemetry flush failed, {len(readings)} reading(s) dropped: {e}")
+                # Session progress is cheap to keep; retry it on the next flush
+                with self._lock:
+                    for session_id, reading in latest.items():
+                        if _newer(reading, self._latest.get(session_id)):
+                            self._latest[session_id] = reading
+                return 0
+            for session_id, reading in latest.items():
+                publish_reading(session_id, reading)
+            return len(readings)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name='telemetry-flusher')
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error in telemetry flusher: {e}")
+
+
+def _session_update(session_id, reading):
+    """Move an active session to a reading, unless a newer one already landed"""
+    fields = {'updated_at': datetime.utcnow(), 'last_reading_at': reading['ts']}
+    if reading['power_kw'] is not None:
+        fields['power_kw'] = reading['power_kw']
+    if reading['soc'] is not None:
+        fields['progress'] = round(reading['soc'])
+        fields['battery_end'] = round(reading['soc'])
+    return UpdateOne(
+        {'_id': ObjectId(session_id), 'status': 'active', 'last_reading_at': {'$not': {'$gte': reading['ts']}}},
+        {'$set': fields, '$max': {'energy_delivered': round(reading['energy_kwh'], 3)}}
+    )
+
+
+_buffer = TelemetryBuffer()
+
+
+def get_telemetry_buffer():
+    return _buffer
+
+
+def record_readings(session_id, station_id, readings):
+    _buffer.add(str(session_id), str(station_id), readings)
+
+
+def final_meter_fields(pending):
+    """
+    Pipeline-update fields that close a session with its last meter values.
+
+    Combines pending, the newest reading still buffered in this process
+    (from TelemetryBuffer.pending(), or None), with what earlier flushes
+    wrote to the session document. The caller discards the buffered update
+    once its guarded update has matched; a flush that lands first is
+    harmless, as its values are already included. Sessions that never
+    reported telemetry fall back to estimating energy from ``duration``,
+    which must be set by an earlier stage.
+
+    Returns:
+        {'energy_delivered': expression, 'battery_end': expression}
+    """
+    has_readings = {'$ne': [{'$ifNull': ['$last_reading_at', None]}, None]}
+    energy = {'$ifNull': ['$energy_delivered', 0]}
+    battery_end = '$battery_end'
+    if pending is not None:
+        has_readings = True
+        energy = {'$max': [energy, pending['energy_kwh']]}
+        if pending['soc'] is not None:
+            battery_end = {'$literal': round(pending['soc'])}
+    return {
+        'energy_delivered': {'$cond': [
+            has_readings,
+            {'$round': [energy, 3]},
+            {'$round': [{'$multiply': ['$duration', ESTIMATED_KWH_PER_MINUTE]}, 1]}
+        ]},
+        'battery_end': battery_end
+    }
@@ -0,0 +1,99 @@
+"""
+Materialized per-user charging statistics.
+
+Each user has one ``user_stats`` document (keyed by user id) holding running
+totals over their completed sessions. stop_session adds to it with a single
+atomic $inc, so the dashboard reads one document by primary key instead of
+scanning the user's whole history. rebuild_user_stats() recomputes the
+documents from the sessions collection for backfills and repairs.
+"""
+
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from app import mongo
+
+# kg of CO2 avoided per kWh delivered (versus an equivalent petrol car)
+CO2_KG_PER_KWH = 0.4
+
+
+def _stats_update(energy_delivered, cost, duration):
+    energy_delivered = energy_delivered or 0
+    return {
+        '$inc': {
+            'total_sessions': 1,
+            'total_energy': energy_delivered,
+            'total_cost': cost or 0,
+            'total_duration': duration or 0,
+            'co2_saved': energy_delivered * CO2_KG_PER_KWH
+        },
+        '$set': {'updated_at': datetime.utcnow()}
+    }
+
+
+def record_completed_session(user_id, energy_delivered, cost, duration, session=None):
+    """Add one completed session to the user's totals"""
+    mongo.db.user_stats.update_one(
+        {'_id': user_id}, _stats_update(energy_delivered, cost, duration), upsert=True, session=session
+    )
+
+
+def record_completed_sessions(sessions, session=None):
+    """Add many completed session documents to their users' totals in one bulk write"""
+    # One update per user, so a user with several sessions in the batch is upserted once
+    updates = {}
+    for s in sessions:
+        update = _stats_update(s.get('energy_delivered'), s.get('cost'), s.get('duration'))
+        if s['user_id'] in updates:
+            totals = updates[s['user_id']]['$inc']
+            for key, value in update['$inc'].items():
+                totals[key] += value
+        else:
+            updates[s['user_id']] = update
+    requests = [UpdateOne({'_id': user_id}, update, upsert=True) for user_id, update in updates.items()]
+    if requests:
+        mongo.db.user_stats.bulk_write(requests, ordered=False, session=session)
+
+
+def get_user_stats(user_id):
+    """Return the stats response for a user (zeros if they have never charged)"""
+    doc = mongo.db.user_stats.find_one({'_id': user_id}) or {}
+    total_sessions = doc.get('total_sessions', 0)
+    return {
+        'totalEnergy': round(doc.get('total_energy', 0), 1),
+        'totalCost': round(doc.get('total_cost', 0), 2),
+        'totalSessions': total_sessions,
+        'avgSessionDuration': round(doc.get('total_duration', 0) / total_sessions) if total_sessions else 0,
+        'co2Saved': round(doc.get('co2_saved', 0), 1)
+    }
+
+
+def rebuild_user_stats(db, user_id=None):
+    """
+    Recompute user_stats from completed sessions with one aggregation.
+
+    Args:
+        db: Database instance
+        user_id: Rebuild a single user, or every user when None
+    """
+    match = {'status': 'completed'}
+    if user_id is not None:
+        match['user_id'] = user_id
+        # $merge only writes users that still have sessions
+        db.user_stats.delete_one({'_id': user_id})
+    db.sessions.aggregate([
+        {'$match': match},
+        {'$group': {
+            '_id': '$user_id',
+            'total_sessions': {'$sum': 1},
+            'total_energy': {'$sum': {'$ifNull': ['$energy_delivered', 0]}},
+            'total_cost': {'$sum': {'$ifNull': ['$cost', 0]}},
+            'total_duration': {'$sum': {'$ifNull': ['$duration', 0]}}
+        }},
+        {'$set': {
+            'co2_saved': {'$multiply': ['$total_energy', CO2_KG_PER_KWH]},
+            'updated_at': '$$NOW'
+        }},
+        {'$merge': {'into': 'user_stats', 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+    ])
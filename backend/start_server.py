@@ -1,10 +1,11 @@
 """
 Simple server startup script without auto-reload
 """
-from app import create_app
+from app import create_app, start_background_jobs
 
 if __name__ == '__main__':
     app = create_app()
+    start_background_jobs(app)
     print("Starting EVPulse API server...")
     print("Server will be available at http://localhost:5000")
     print("Press Ctrl+C to stop the server\n")
@@ -2,9 +2,11 @@ import { MapPin, Star, Zap, Clock, ChevronRight, Navigation, Plug } from 'lucide
 import { formatDistance, getStatusColor, getStatusText } from '../../utils';
 
 const StationCard = ({ station, onClick, compact = false }) => {
-  const availablePorts = station.ports?.filter(p => p.status === 'available').length || 0;
-  const totalPorts = station.ports?.length || 0;
-  const portTypes = [...new Set(station.ports?.map(p => p.type) || [])];
+  // Prefer the server-maintained summary; mock data only has the ports array
+  const summary = station.availabilitySummary;
+  const availablePorts = summary ? summary.available : station.ports?.filter(p => p.status === 'available').length || 0;
+  const totalPorts = summary ? summary.total : station.ports?.length || 0;
+  const portTypes = summary ? summary.byType.map(t => t.type) : [...new Set(station.ports?.map(p => p.type) || [])];
 
   if (compact) {
     return (
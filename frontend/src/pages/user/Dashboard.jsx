@@ -37,6 +37,18 @@ const Dashboard = () => {
     fetchDashboardData();
   }, [user?.id]);
 
+  // Progress is pushed by the server while a session is charging
+  useEffect(() => {
+    if (!activeSession?.id) return undefined;
+    return sessionsAPI.streamProgress(activeSession.id, (update) => {
+      setActiveSession((current) => (current && current.id === update.id ? { ...current, ...update } : current));
+    });
+  }, [activeSession?.id]);
+
+  const minutesRemaining = activeSession?.estimatedCompletion
+    ? Math.max(0, Math.round((new Date(`${activeSession.estimatedCompletion}Z`) - Date.now()) / 60000))
+    : null;
+
   const fetchDashboardData = async () => {
     try {
       const [statsRes, activeRes, bookingsRes, historyRes, notifRes] = await Promise.all([
@@ -117,7 +129,7 @@ const Dashboard = () => {
                   </span>
                   <span className="flex items-center gap-1">
                     <Clock className="w-4 h-4" />
-                    ~12 min remaining
+                    ~{minutesRemaining ?? 12} min remaining
                   </span>
                 </div>
               </div>
@@ -146,6 +146,41 @@ export const stationsAPI = {
     }
   },
 
+  // Stations changed since a syncToken from a previous list or changes call
+  getChanges: async (syncToken, fields) => {
+    try {
+      const params = new URLSearchParams({ since: syncToken });
+      if (fields) params.append('fields', fields);
+      return await apiRequest(`/stations?${params.toString()}`);
+    } catch (error) {
+      return { success: false, error: error.message };
+    }
+  },
+
+  // Resolve many stations in one request; data is keyed by station id
+  getBatch: async (ids, fields) => {
+    try {
+      return await apiRequest('/stations/batch', {
+        method: 'POST',
+        body: JSON.stringify({ ids, fields }),
+      });
+    } catch (error) {
+      return { success: false, error: error.message };
+    }
+  },
+
+  // Price a planned charge at many stations; data is keyed by station id
+  getQuotes: async (ids, { chargingType, start, durationMinutes, energyKwh } = {}) => {
+    try {
+      return await apiRequest('/stations/quotes', {
+        method: 'POST',
+        body: JSON.stringify({ ids, chargingType, start, durationMinutes, energyKwh }),
+      });
+    } catch (error) {
+      return { success: false, error: error.message };
+    }
+  },
+
   getByOperator: async (operatorId) => {
     try {
       const response = await apiRequest(`/stations/operator/${operatorId}`);
@@ -231,10 +266,14 @@ export const sessionsAPI = {
     }
   },
 
-  stopSession: async (sessionId) => {
+  stopSession: async (sessionId, session = {}) => {
     try {
       return await apiRequest(`/sessions/stop/${sessionId}`, {
         method: 'POST',
+        body: JSON.stringify({
+          stationId: session.stationId,
+          chargingType: session.chargingType,
+        }),
       });
     } catch (error) {
       return { success: false, error: error.message };
@@ -248,6 +287,55 @@ export const sessionsAPI = {
       return { success: false, error: error.message };
     }
   },
+
+  // Per-bucket sessions, energy, revenue and occupancy; bucket is '15min', 'hour' or 'day'
+  getStationTimeline: async (stationId, { bucket = 'hour', from, to } = {}) => {
+    try {
+      const params = new URLSearchParams({ bucket });
+      if (from) params.set('from', from);
+      if (to) params.set('to', to);
+      return await apiRequest(`/sessions/station/${stationId}/timeline?${params.toString()}`);
+    } catch (error) {
+      return { success: false, error: error.message };
+    }
+  },
+
+  // Live progress over server-sent events; returns a function that closes the stream.
+  // EventSource cannot send headers, so each connection uses a short-lived stream token
+  // and a fresh one is fetched whenever the browser gives up on reconnecting.
+  streamProgress: (sessionId, onUpdate) => {
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    const connect = async () => {
+      const res = await apiRequest(`/sessions/${sessionId}/stream-token`, { method: 'POST' }).catch(() => null);
+      if (closed) return;
+      if (!res?.success) {
+        retry = setTimeout(connect, 5000);
+        return;
+      }
+      const params = new URLSearchParams({ token: res.data.token });
+      source = new EventSource(`${API_BASE_URL}/sessions/${sessionId}/stream?${params.toString()}`);
+      source.addEventListener('progress', (event) => onUpdate(JSON.parse(event.data)));
+      source.addEventListener('end', () => {
+        closed = true;
+        source.close();
+      });
+      source.onerror = () => {
+        if (!closed && source.readyState === EventSource.CLOSED) {
+          retry = setTimeout(connect, 5000);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) source.close();
+    };
+  },
 };
 
 // Bookings API